@@ -438,6 +438,18 @@ class Application:
             "model_name": self.model_name,
             "pdf_file_path": self.left_pdf_url,
             "output_file_path": self.right_pdf_url,
+            "max_workers": self.yaml_config['common'].get('max_workers', 1),
+            "batch_chars": self.yaml_config['common'].get('batch_chars', 0),
+            "streaming": self.yaml_config['common'].get('streaming', False),
+            "parse_workers": self.yaml_config['common'].get('parse_workers', 1),
+            "render_workers": self.yaml_config['common'].get('render_workers', 1),
+            "structured": self.yaml_config['common'].get('structured', False),
+            "stream_responses": self.yaml_config['common'].get('stream_responses', False),
+            "metrics_path": self.yaml_config['common'].get('metrics_path'),
+            "cache_path": self.yaml_config['common'].get('cache_path'),
+            "cache_max_entries": self.yaml_config['common'].get('cache_max_entries', 100000),
+            "image_cache_dir": self.yaml_config['common'].get('image_cache_dir'),
+            "model_config": self.yaml_config.get(self.model_type) or {},
         }
         for widget in self.config_widget.children():
             if widget.property("tag") == "model-title":
@@ -1,8 +1,8 @@
 from PyQt5.QtCore import QThread, pyqtSignal
 
-from ..translator import PDFTranslator
-from ..model import QWenModel, OpenAIModel
-from ..utils import LOG
+from ..translator import PDFTranslator, TranslationCache, ImageCache
+from ..model import Model, BalancedModel, GLMModel, QWenModel, OpenAIModel, RequestScheduler
+from ..utils import LOG, METRICS
 
 
 class TranslatorThread(QThread):
@@ -17,20 +17,44 @@ class TranslatorThread(QThread):
     def __init__(self, info: dict):
         super().__init__()
 
+        # 翻译缓存（配置了缓存路径时才使用）
+        cache = TranslationCache(info['cache_path'], info['cache_max_entries']) if info.get('cache_path') else None
+
+        # 图片缓存（配置了缓存目录时才使用）
+        image_cache = ImageCache(info['image_cache_dir']) if info.get('image_cache_dir') else None
+
+        # 是否使用流式请求
+        stream_responses = info.get('stream_responses', False)
+
+        # 模型在`config.yaml`中的配置，包括限速和多节点的配置
+        model_config = info.get('model_config') or {}
+
         if info['model_type'] == "QWenModel":
-            model = QWenModel(
+            # 配置了多个`Key`时，请求分摊到每个`Key`上
+            models = [QWenModel(
                 api_url=info["api_url"],
-                api_key=info["api_key"],
+                api_key=api_key,
                 timeout=int(info["timeout"]),
-            )
-            self.translator = PDFTranslator(model)
+            ) for api_key in model_config.get('api_keys') or [info["api_key"]]]
+            self.translator = PDFTranslator(self._get_balanced_model(models, model_config), cache, stream_responses,
+                                            image_cache=image_cache)
+
+        elif info['model_type'] == "GLMModel":
+            # 配置了多个模型地址时，请求分摊到每个地址上
+            models = [GLMModel(
+                model_url=model_url,
+                timeout=int(info["timeout"]),
+            ) for model_url in model_config.get('model_urls') or [info["model_url"]]]
+            self.translator = PDFTranslator(self._get_balanced_model(models, model_config), cache, stream_responses,
+                                            image_cache=image_cache)
 
         elif info['model_type'] == "OpenAIModel":
             model = OpenAIModel(
                 model=info["model_name"],
                 api_key=info["api_key"]
             )
-            self.translator = PDFTranslator(model)
+            model.set_scheduler(RequestScheduler.from_config(model_config))
+            self.translator = PDFTranslator(model, cache, stream_responses, image_cache=image_cache)
 
         else:
             self.translator = None
@@ -38,6 +62,15 @@ class TranslatorThread(QThread):
 
         self.info = info
 
+    # 每个节点单独限速，有多个节点时用`BalancedModel`组合起来
+    @staticmethod
+    def _get_balanced_model(models: [Model], model_config: dict) -> Model:
+        for model in models:
+            model.set_scheduler(RequestScheduler.from_config(model_config))
+        if len(models) == 1:
+            return models[0]
+        return BalancedModel(models, strategy=model_config.get('balance_strategy', "least_outstanding"))
+
     def run(self):
         if self.translator:
             try:
@@ -45,7 +78,16 @@ class TranslatorThread(QThread):
                     pdf_file_path=self.info['pdf_file_path'],
                     output_file_path=self.info['output_file_path'],
                     file_format="PDF",
+                    max_workers=self.info.get('max_workers', 1),
+                    batch_chars=self.info.get('batch_chars', 0),
+                    resume=True,
+                    streaming=self.info.get('streaming', False),
+                    parse_workers=self.info.get('parse_workers', 1),
+                    render_workers=self.info.get('render_workers', 1),
+                    structured=self.info.get('structured', False),
                 )
             except Exception as e:
                 LOG.error(e)
+            if self.info.get('metrics_path'):
+                METRICS.write(self.info['metrics_path'])
         self.finished.emit()
@@ -0,0 +1,92 @@
+import sys
+import os
+
+# 获取当前脚本所在的目录
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 获取项目根目录
+project_root = os.path.dirname(script_dir)
+
+# 将项目根目录添加到 Python 路径中
+sys.path.append(project_root)
+
+from ai_translator.utils import BatchArgumentParser, ConfigLoader, LOG, METRICS
+from ai_translator.model import OpenAIModel, HTTPClient, RequestScheduler
+from ai_translator.translator import BatchTranslator, JobQueue, TranslationCache, ImageCache
+
+if __name__ == "__main__":
+    # 创建参数解析器
+    argument_parser = BatchArgumentParser()
+    # 解析参数，并返回
+    args = argument_parser.parse_arguments()
+
+    # 创建配置加载器
+    config_loader = ConfigLoader(args.config)
+    # 加载配置参数，并返回
+    config = config_loader.load_config()
+    batch_config = config.get('batch', {})
+
+    # 设置`HTTP`连接池的参数
+    HTTPClient.configure(limit_per_host=config['common'].get('max_connections_per_host'))
+
+    # 获取模型名称
+    model_name = args.openai_model if args.openai_model else config['OpenAIModel']['model']
+
+    # 获取 APIKey（优先从参数中读取，其次从配置中读取）
+    api_key = args.openai_api_key if args.openai_api_key else config['OpenAIModel']['api_key']
+
+    # 根据模型名称和 APIKey，创建 OpenAIModel，所有任务共用同一个模型和限速
+    model = OpenAIModel(model=model_name, api_key=api_key)
+    model.set_scheduler(RequestScheduler.from_config(config['OpenAIModel']))
+
+    # 获取 Book 文件的类型（优先从参数中读取，其次从配置中读取）
+    file_format = args.file_format if args.file_format else config['common']['file_format']
+
+    # 创建任务队列，并添加输入目录或`glob`模式中的`PDF`文件，已经在队列中的文件不重复添加
+    queue = JobQueue(args.queue if args.queue else batch_config.get('queue_path', 'batch/jobs.sqlite3'))
+    output_dir = args.output_dir if args.output_dir else batch_config.get('output_dir')
+    for source in (args.input if args.input else batch_config.get('inputs') or []):
+        added = queue.add_from_source(source, file_format, output_dir)
+        LOG.info(f"添加了 {added} 个任务：{source}")
+
+    if args.retry_failed:
+        LOG.info(f"有 {queue.requeue_failed()} 个失败的任务重新放回队列")
+
+    # 创建翻译缓存（配置了缓存路径时才使用），所有任务共用
+    cache_path = config['common'].get('cache_path')
+    cache = TranslationCache(cache_path, config['common'].get('cache_max_entries', 100000)) if cache_path else None
+
+    # 创建图片缓存（配置了缓存目录时才使用）
+    image_cache_dir = config['common'].get('image_cache_dir')
+    image_cache = ImageCache(image_cache_dir) if image_cache_dir else None
+
+    batch_translator = BatchTranslator(
+        model,
+        queue,
+        cache,
+        book_workers=args.book_workers if args.book_workers else batch_config.get('book_workers', 1),
+        max_concurrent_requests=(args.max_concurrent_requests if args.max_concurrent_requests
+                                 else batch_config.get('max_concurrent_requests', 4)),
+        manifest_path=args.manifest if args.manifest else batch_config.get('manifest_path'),
+        max_attempts=args.max_attempts if args.max_attempts else batch_config.get('max_attempts', 2),
+        stream_responses=config['common'].get('stream_responses', False),
+        image_cache=image_cache)
+
+    # 每个`PDF`文件内部的翻译参数，和`main.py`相同
+    batch_chars = args.batch_chars if args.batch_chars is not None else config['common'].get('batch_chars', 0)
+    batch_translator.run(max_workers=args.max_workers if args.max_workers else config['common'].get('max_workers', 1),
+                         batch_chars=batch_chars,
+                         streaming=args.streaming or config['common'].get('streaming', False),
+                         parse_workers=(args.parse_workers if args.parse_workers
+                                        else config['common'].get('parse_workers', 1)),
+                         render_workers=(args.render_workers if args.render_workers
+                                         else config['common'].get('render_workers', 1)),
+                         structured=args.structured or config['common'].get('structured', False))
+
+    queue.close()
+
+    # 导出运行指标（优先从参数中读取，其次从配置中读取）
+    metrics_path = args.metrics_path if args.metrics_path else config['common'].get('metrics_path')
+    if metrics_path:
+        METRICS.write(metrics_path)
+        LOG.info(f"运行指标已导出：{metrics_path}")
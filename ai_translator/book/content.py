@@ -54,6 +54,9 @@ class Content:
     # 顶部的坐标
     top_y: float = 0
 
+    # 在原`PDF`页面中的区域`(x0, top, x1, bottom)`，坐标原点在页面的左上角，为`None`时位置未知
+    bbox: tuple = None
+
     # 构造函数
     def __init__(self, content_type, original, translation=None):
         self.content_type = content_type
@@ -87,6 +90,9 @@ class TableContent(Content):
 
     col_widths: [float]
 
+    # 每个单元格在原`PDF`页面中的区域，和`get_rows()`的行列对应，合并的单元格为`None`
+    cell_bboxes: [[tuple]] = None
+
     def __init__(self, data, translation=None):
 
         # 根据`data`，创建`DataFrame`
@@ -98,6 +104,12 @@ class TableContent(Content):
         super().__init__(ContentType.TABLE, df)
 
     def set_translation(self, translation: any, status: bool):
+        # 已经是表格形式的翻译结果（例如不需要翻译的表格），直接使用
+        if isinstance(translation, pd.DataFrame):
+            self.translation = translation
+            self.status = status
+            return
+
         try:
             if not isinstance(translation, str):
                 raise "Error"
@@ -150,6 +162,14 @@ class TableContent(Content):
         target_df = self.translation if translated else self.original
         target_df.at[row_idx, col_idx] = new_value
 
+    # 获取原文的所有行，每一行是单元格的数组
+    # 解析器把整张表格放在一行中（每个单元格是表格的一行），这种情况下展开成原来的行
+    def get_rows(self) -> [[any]]:
+        rows = self.original.values.tolist()
+        if len(rows) == 1 and rows[0] and all(isinstance(cell, (list, tuple)) for cell in rows[0]):
+            return [list(row) for row in rows[0]]
+        return rows
+
     # 获取原文的字符串格式
     def get_original_as_str(self) -> str:
         self.original: pd.DataFrame
@@ -12,9 +12,9 @@ project_root = os.path.dirname(script_dir)
 # 将项目根目录添加到 Python 路径中
 sys.path.append(project_root)
 
-from ai_translator.utils import ArgumentParser, ConfigLoader, LOG
-from ai_translator.model import OpenAIModel, QWenModel
-from ai_translator.translator import PDFTranslator
+from ai_translator.utils import ArgumentParser, ConfigLoader, LOG, METRICS
+from ai_translator.model import OpenAIModel, QWenModel, HTTPClient, RequestScheduler
+from ai_translator.translator import PDFTranslator, TranslationCache, ImageCache
 
 if __name__ == "__main__":
     # 创建参数解析器
@@ -27,6 +27,9 @@ if __name__ == "__main__":
     # 加载配置参数，并返回
     config = config_loader.load_config()
 
+    # 设置`HTTP`连接池的参数
+    HTTPClient.configure(limit_per_host=config['common'].get('max_connections_per_host'))
+
     # 获取模型名称
     model_name = args.openai_model if args.openai_model else config['OpenAIModel']['model']
 
@@ -36,14 +39,48 @@ if __name__ == "__main__":
     # 根据模型名称和 APIKey，创建 OpenAIModel
     model = OpenAIModel(model=model_name, api_key=api_key)
 
+    # 按配置的每分钟请求数和`token`数限速，被限流或超时时自动退避重试
+    model.set_scheduler(RequestScheduler.from_config(config['OpenAIModel']))
+
     # 获取 Book 文件的路径（优先从参数中读取，其次从配置中读取）
     pdf_file_path = args.book if args.book else config['common']['book']
 
     # 获取 Book 文件的类型（优先从参数中读取，其次从配置中读取）
     file_format = args.file_format if args.file_format else config['common']['file_format']
 
+    # 获取同时进行中的翻译请求数量（优先从参数中读取，其次从配置中读取）
+    max_workers = args.max_workers if args.max_workers else config['common'].get('max_workers', 1)
+
+    # 获取合并翻译时每个请求的原文字符数上限（优先从参数中读取，其次从配置中读取）
+    batch_chars = args.batch_chars if args.batch_chars is not None else config['common'].get('batch_chars', 0)
+
+    # 获取解析`PDF`使用的进程数量（优先从参数中读取，其次从配置中读取）
+    parse_workers = args.parse_workers if args.parse_workers else config['common'].get('parse_workers', 1)
+
+    # 获取渲染`PDF`使用的进程数量（优先从参数中读取，其次从配置中读取）
+    render_workers = args.render_workers if args.render_workers else config['common'].get('render_workers', 1)
+
+    # 创建翻译缓存（配置了缓存路径时才使用）
+    cache_path = config['common'].get('cache_path')
+    cache = TranslationCache(cache_path, config['common'].get('cache_max_entries', 100000)) if cache_path else None
+
+    # 创建图片缓存（配置了缓存目录时才使用）
+    image_cache_dir = config['common'].get('image_cache_dir')
+    image_cache = ImageCache(image_cache_dir) if image_cache_dir else None
+
     # 实例化 PDFTranslator 类
-    translator = PDFTranslator(model)
+    translator = PDFTranslator(model, cache, stream_responses=config['common'].get('stream_responses', False),
+                               image_cache=image_cache)
 
     # 调用 translate_pdf() 方法
-    translator.translate_pdf(pdf_file_path, file_format)
+    translator.translate_pdf(pdf_file_path, file_format, max_workers=max_workers, batch_chars=batch_chars,
+                             resume=args.resume, streaming=args.streaming or config['common'].get('streaming', False),
+                             parse_workers=parse_workers,
+                             render_workers=render_workers,
+                             structured=args.structured or config['common'].get('structured', False))
+
+    # 导出运行指标（优先从参数中读取，其次从配置中读取）
+    metrics_path = args.metrics_path if args.metrics_path else config['common'].get('metrics_path')
+    if metrics_path:
+        METRICS.write(metrics_path)
+        LOG.info(f"运行指标已导出：{metrics_path}")
@@ -1,4 +1,9 @@
 from .model import Model
+from .http_client import HTTPClient
+from .exceptions import RateLimitException, RequestTimeoutException
+from .rate_limiter import RequestScheduler, TokenBucket
 from .glm_model import GLMModel
 from .openai_model import OpenAIModel
-from .qwen_model import QWenModel
\ No newline at end of file
+from .qwen_model import QWenModel
+from .mock_model import MockModel
+from .balanced_model import BalancedModel
@@ -0,0 +1,281 @@
+import itertools
+import threading
+import time
+
+from .model import Model
+
+from ..utils import LOG, METRICS
+
+
+class _Endpoint:
+
+    # 实际发送请求的模型
+    model: Model
+
+    # 加权轮询的权重
+    weight: int
+
+    def __init__(self, model: Model, weight: int):
+        self.model = model
+        self.weight = weight
+        # 进行中的请求数
+        self.outstanding = 0
+        # 连续失败的次数
+        self.failures = 0
+        # 熔断结束的时间点，在这之前不再分配请求
+        self.open_until = 0.0
+        # 熔断结束后只放行一个试探请求，成功后才恢复
+        self.probing = False
+        # 请求耗时的指数移动平均值，单位：秒
+        self.latency = 0.0
+
+    def get_name(self) -> str:
+        return self.model.get_model_name()
+
+
+class BalancedModel(Model):
+
+    # 分配请求的策略：`least_outstanding`（进行中请求最少）或`round_robin`（加权轮询）
+    STRATEGIES = ("least_outstanding", "round_robin")
+
+    # 分配请求的策略
+    strategy: str
+
+    # 连续失败多少次后熔断
+    failure_threshold: int
+
+    # 熔断的时长，单位：秒
+    open_seconds: float
+
+    # 平均耗时超过这个值时视为慢节点，按失败处理，为`None`时不检查，单位：秒
+    slow_seconds: float
+
+    # 后台健康检查的间隔，只检查已经熔断的节点，为`0`时不检查，单位：秒
+    health_check_interval: float
+
+    # 健康检查使用的`prompt`
+    HEALTH_CHECK_PROMPT = "翻译为中文，不要添加多余信息：OK"
+
+    # 平均耗时的平滑系数
+    LATENCY_ALPHA = 0.2
+
+    def __init__(self, models: [Model], weights: [int] = None, strategy: str = "least_outstanding",
+                 failure_threshold: int = 3, open_seconds: float = 30.0, slow_seconds: float = None,
+                 health_check_interval: float = 0, name: str = None):
+        if not models:
+            raise Exception("至少需要一个模型")
+        if strategy not in self.STRATEGIES:
+            raise Exception(f"不支持的负载均衡策略：{strategy}")
+        weights = weights or [1] * len(models)
+        if len(weights) != len(models):
+            raise Exception("权重的数量和模型的数量不一致")
+
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.slow_seconds = slow_seconds
+        self.health_check_interval = health_check_interval
+        self._endpoints = [_Endpoint(model, weight) for model, weight in zip(models, weights)]
+        # 加权轮询：权重为`n`的节点在序列中出现`n`次
+        self._round_robin = itertools.cycle([endpoint for endpoint in self._endpoints
+                                             for _ in range(max(1, endpoint.weight))])
+        self._lock = threading.Lock()
+        self._name = name or self._get_default_name(models)
+        # 请求可能发到任何一个节点，以上下文最短的节点为准
+        self.context_tokens = min(model.context_tokens for model in models)
+
+        if health_check_interval > 0:
+            threading.Thread(target=self._run_health_check, daemon=True).start()
+
+    # 各个节点的模型名称相同时（同一个模型的多个`Key`）沿用该名称，这样翻译缓存可以共用
+    @staticmethod
+    def _get_default_name(models: [Model]) -> str:
+        names = sorted(set(model.get_model_name() for model in models))
+        if len(names) == 1:
+            return names[0]
+        return "BalancedModel:" + "|".join(names)
+
+    def get_model_name(self) -> str:
+        return self._name
+
+    # 依次尝试可用的节点，一个节点失败后换下一个，所有节点都失败时抛出最后一个异常
+    def make_request(self, prompt) -> (str, bool):
+        tried = set()
+        error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise error or Exception("没有可用的模型节点")
+            started_at = time.monotonic()
+            try:
+                result = endpoint.model.make_request(prompt)
+            except Exception as e:
+                self._release(endpoint, started_at, e)
+                error = e
+                continue
+            self._release(endpoint, started_at)
+            return result
+
+    async def async_make_request(self, prompt) -> (str, bool):
+        tried = set()
+        error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise error or Exception("没有可用的模型节点")
+            started_at = time.monotonic()
+            try:
+                result = await endpoint.model.async_make_request(prompt)
+            except Exception as e:
+                self._release(endpoint, started_at, e)
+                error = e
+                continue
+            self._release(endpoint, started_at)
+            return result
+
+    # 流式请求：还没有收到任何片段时失败，可以换下一个节点重试；收到片段之后失败，直接抛出异常
+    # 调用方提前关闭生成器（`break`、`close()`、处理片段时出错）时，只释放节点，不计入成功或失败
+    def stream_request(self, prompt):
+        tried = set()
+        error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise error or Exception("没有可用的模型节点")
+            started_at = time.monotonic()
+            received = False
+            released = False
+            try:
+                for chunk in endpoint.model.stream_request(prompt):
+                    received = True
+                    yield chunk
+                released = True
+                self._release(endpoint, started_at)
+                return
+            except Exception as e:
+                released = True
+                self._release(endpoint, started_at, e)
+                if received:
+                    raise
+                error = e
+            finally:
+                if not released:
+                    self._abandon(endpoint)
+
+    # 以流式请求获取完整的结果，每个节点通过自己的调度器重试
+    # 还没有片段交给`on_chunk`时失败，可以换下一个节点重试；之后失败，直接抛出异常
+    def make_streaming_request(self, prompt, on_chunk=None) -> (str, bool):
+        tried = set()
+        error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise error or Exception("没有可用的模型节点")
+            started_at = time.monotonic()
+            received = []
+
+            def forward(chunk):
+                received.append(chunk)
+                on_chunk(chunk)
+
+            try:
+                result = endpoint.model.make_streaming_request(prompt, forward if on_chunk else None)
+            except Exception as e:
+                self._release(endpoint, started_at, e)
+                if received:
+                    raise
+                error = e
+                continue
+            self._release(endpoint, started_at)
+            return result
+
+    # 向所有已经熔断的节点发送试探请求，成功的节点立即恢复
+    def check_health(self):
+        with self._lock:
+            endpoints = [endpoint for endpoint in self._endpoints if endpoint.open_until and not endpoint.probing]
+            for endpoint in endpoints:
+                endpoint.probing = True
+                endpoint.outstanding += 1
+        for endpoint in endpoints:
+            started_at = time.monotonic()
+            try:
+                endpoint.model.make_request(self.HEALTH_CHECK_PROMPT)
+            except Exception as e:
+                self._release(endpoint, started_at, e)
+                continue
+            self._release(endpoint, started_at)
+
+    # 各个节点的状态，用于日志和监控
+    def get_stats(self) -> [dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "name": endpoint.get_name(),
+                "outstanding": endpoint.outstanding,
+                "failures": endpoint.failures,
+                "open": endpoint.open_until > now,
+                "latency": endpoint.latency,
+            } for endpoint in self._endpoints]
+
+    # 选出一个没有尝试过且可用的节点，并记为进行中
+    def _acquire(self, tried: set) -> _Endpoint:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self._endpoints
+                          if id(endpoint) not in tried and self._is_available(endpoint, now)]
+            if not candidates:
+                return None
+            if self.strategy == "least_outstanding":
+                endpoint = min(candidates, key=lambda item: (item.outstanding / max(1, item.weight), item.latency))
+            else:
+                endpoint = next(item for item in self._round_robin if item in candidates)
+            if endpoint.open_until and endpoint.open_until <= now:
+                endpoint.probing = True
+            endpoint.outstanding += 1
+            tried.add(id(endpoint))
+            return endpoint
+
+    # 熔断中的节点不可用，熔断结束后只允许一个试探请求
+    @staticmethod
+    def _is_available(endpoint: _Endpoint, now: float) -> bool:
+        if not endpoint.open_until:
+            return True
+        return endpoint.open_until <= now and not endpoint.probing
+
+    # 请求结束，更新节点的耗时和失败次数，`error`为`None`表示成功
+    def _release(self, endpoint: _Endpoint, started_at: float, error: Exception = None):
+        elapsed = time.monotonic() - started_at
+        METRICS.observe("model_endpoint_request_seconds", elapsed, endpoint=endpoint.get_name())
+        if error is not None:
+            METRICS.inc("model_endpoint_errors_total", endpoint=endpoint.get_name())
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.latency = elapsed if not endpoint.latency else \
+                endpoint.latency + self.LATENCY_ALPHA * (elapsed - endpoint.latency)
+            endpoint.probing = False
+            is_slow = self.slow_seconds is not None and endpoint.latency > self.slow_seconds
+            if error is None and not is_slow:
+                endpoint.failures = 0
+                endpoint.open_until = 0.0
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self.failure_threshold or endpoint.open_until:
+                endpoint.open_until = time.monotonic() + self.open_seconds
+                # 熔断后重新计算耗时，否则慢节点恢复后仍然会被平均值拖住
+                endpoint.latency = 0.0
+                reason = error if error is not None else f"平均耗时{elapsed:.1f}秒"
+                LOG.warning(f"模型节点{endpoint.get_name()}熔断{self.open_seconds:.0f}秒：{reason}")
+
+    # 请求被调用方放弃，没有结果：只减少进行中的请求数，结束试探状态，不更新耗时和失败次数
+    def _abandon(self, endpoint: _Endpoint):
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.probing = False
+
+    def _run_health_check(self):
+        while True:
+            time.sleep(self.health_check_interval)
+            try:
+                self.check_health()
+            except Exception as e:
+                LOG.error(f"健康检查失败：{e}")
@@ -0,0 +1,22 @@
+class RateLimitException(Exception):
+
+    # 服务端要求的等待时间（`Retry-After`），单位：秒，没有时为`None`
+    retry_after: float
+
+    def __init__(self, message: str, retry_after: float = None):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class RequestTimeoutException(Exception):
+    pass
+
+
+# 解析`Retry-After`响应头，只支持秒数的格式，无法解析时返回`None`
+def parse_retry_after(value: str) -> float:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
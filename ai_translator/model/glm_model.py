@@ -1,7 +1,14 @@
-import requests
+import asyncio
+import codecs
+
+import aiohttp
+import simplejson
+
 from simplejson import errors as simplejson_errors
 
+from .exceptions import RateLimitException, RequestTimeoutException, parse_retry_after
 from .model import Model
+from .http_client import HTTPClient
 
 
 class GLMModel(Model):
@@ -11,28 +18,114 @@ class GLMModel(Model):
     # 超时时间，单位：秒
     timeout: int
 
+    supports_streaming: bool = True
+
+    # `ChatGLM-6B`的上下文长度
+    context_tokens: int = 2048
+
     # 构造函数
     def __init__(self, model_url: str, timeout: int):
         self.model_url = model_url
         self.timeout = timeout
 
+    def get_model_name(self) -> str:
+        return f"GLMModel:{self.model_url}"
+
+    # 同步请求，交给`HTTPClient`的后台事件循环执行，和异步请求共用连接池
     def make_request(self, prompt) -> (str, bool):
+        return HTTPClient.run(self.async_make_request(prompt))
+
+    # 在任何事件循环中调用时，请求都交给`HTTPClient`的后台事件循环执行，共用连接池
+    async def async_make_request(self, prompt) -> (str, bool):
+        return await HTTPClient.async_run(self.async_schedule_request(self._async_send_request, prompt))
+
+    # 流式请求，交给`HTTPClient`的后台事件循环执行
+    def _send_stream_request(self, prompt):
+        return HTTPClient.iterate(self._async_send_stream_request(prompt))
+
+    # 异步流式请求，只等待调度器的限速，不重试
+    async def async_stream_request(self, prompt):
+        await self.async_wait_for_scheduler(prompt)
+        async for chunk in HTTPClient.async_iterate(self._async_send_stream_request(prompt)):
+            yield chunk
+
+    # 逐块返回译文：服务端返回`SSE`或分块的文本时，收到一块返回一块；返回`JSON`时（不支持流式输出），读完后一次性返回
+    async def _async_send_stream_request(self, prompt):
+        try:
+            payload = {
+                "prompt": prompt,
+                "history": [],
+                "stream": True
+            }
+            session = HTTPClient.get_session()
+            # `sock_read`：两次读到数据之间的最长间隔，超过时认为流已经卡住
+            timeout = aiohttp.ClientTimeout(total=self.timeout, sock_read=self.stall_timeout)
+            async with session.post(self.model_url, json=payload, timeout=timeout) as response:
+                if response.status in (429, 503):
+                    raise RateLimitException(f"请求频率受限：{response.status}",
+                                             parse_retry_after(response.headers.get("Retry-After")))
+                response.raise_for_status()
+                if response.content_type == "application/json":
+                    response_dict = await response.json(loads=simplejson.loads, content_type=None)
+                    yield response_dict['response']
+                elif response.content_type == "text/event-stream":
+                    async for data in HTTPClient.iter_sse(response):
+                        text = self._get_event_text(data)
+                        if text:
+                            yield text
+                else:
+                    # 多字节的字符可能被拆到两个块中，使用增量解码
+                    decoder = codecs.getincrementaldecoder("utf-8")()
+                    async for chunk in response.content.iter_any():
+                        text = decoder.decode(chunk)
+                        if text:
+                            yield text
+                    text = decoder.decode(b"", final=True)
+                    if text:
+                        yield text
+        except RateLimitException:
+            raise
+        except asyncio.TimeoutError as e:
+            raise RequestTimeoutException(f"流式请求超过{self.stall_timeout}秒没有返回数据：{e}")
+        except aiohttp.ClientError as e:
+            raise Exception(f"请求异常：{e}")
+        except simplejson_errors.JSONDecodeError as e:
+            raise Exception(f"JSON解析错误：{e}")
+        except Exception as e:
+            raise Exception(f"发生了未知错误：{e}")
+
+    # `SSE`事件的内容可能是`{"response": "..."}`，也可能是纯文本
+    @staticmethod
+    def _get_event_text(data: str) -> str:
+        try:
+            event = simplejson.loads(data)
+        except simplejson_errors.JSONDecodeError:
+            return data
+        return event.get('response', '') if isinstance(event, dict) else data
 
+    async def _async_send_request(self, prompt) -> (str, bool):
         try:
             payload = {
                 "prompt": prompt,
                 "history": []
             }
-            response = requests.post(self.model_url, json=payload, timeout=self.timeout)
-            response.raise_for_status()
-            response_dict = response.json()
+            session = HTTPClient.get_session()
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with session.post(self.model_url, json=payload, timeout=timeout) as response:
+                if response.status in (429, 503):
+                    raise RateLimitException(f"请求频率受限：{response.status}",
+                                             parse_retry_after(response.headers.get("Retry-After")))
+                response.raise_for_status()
+                response_dict = await response.json(loads=simplejson.loads, content_type=None)
             translation = response_dict['response']
             return translation, True
-        except requests.exceptions.Timeout as e:
-            raise Exception(f"请求超时：{e}")
-        except requests.exceptions.RequestException as e:
+        except RateLimitException:
+            raise
+        except asyncio.TimeoutError as e:
+            raise RequestTimeoutException(f"请求超时：{e}")
+        except aiohttp.ClientError as e:
             raise Exception(f"请求异常：{e}")
         except simplejson_errors.JSONDecodeError as e:
-            raise Exception("JSON解析错误：{e}")
+            raise Exception(f"JSON解析错误：{e}")
         except Exception as e:
-            return Exception(f"发生了未知错误：{e}")
+            raise Exception(f"发生了未知错误：{e}")
@@ -0,0 +1,168 @@
+import asyncio
+import atexit
+import threading
+
+import aiohttp
+
+
+# 所有基于`HTTP`的`Model`共用的`keep-alive`连接池
+# 所有请求都在后台的事件循环中执行，共用一个`aiohttp.ClientSession`，复用连接，省去每次请求的`TCP + TLS`握手
+# 同步调用和其他事件循环中的异步调用都交给后台的事件循环执行，所以多个线程、多个事件循环发出的请求也共用同一个连接池
+# 程序退出时关闭这个`ClientSession`，不会留下没有关闭的连接
+class HTTPClient:
+    # 连接池的总连接数上限
+    limit: int = 100
+
+    # 每个主机的连接数上限
+    limit_per_host: int = 10
+
+    # 空闲连接的保留时间，单位：秒
+    keepalive_timeout: float = 30
+
+    # 后台事件循环中的`ClientSession`
+    _session: aiohttp.ClientSession = None
+
+    # 执行同步调用的后台事件循环
+    _loop: asyncio.AbstractEventLoop = None
+
+    _lock = threading.Lock()
+
+    # 设置连接池的参数，只对之后新建的`ClientSession`生效
+    @classmethod
+    def configure(cls, limit: int = None, limit_per_host: int = None, keepalive_timeout: float = None):
+        if limit is not None:
+            cls.limit = limit
+        if limit_per_host is not None:
+            cls.limit_per_host = limit_per_host
+        if keepalive_timeout is not None:
+            cls.keepalive_timeout = keepalive_timeout
+
+    # 获取`ClientSession`，没有就创建一个，只能在后台事件循环中调用（通过`run`、`async_run`等方法）
+    @classmethod
+    def get_session(cls) -> aiohttp.ClientSession:
+        if asyncio.get_running_loop() is not cls._loop:
+            raise RuntimeError("请通过`HTTPClient.async_run`或`HTTPClient.run`在后台事件循环中发送请求")
+        if cls._session is None or cls._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=cls.limit,
+                limit_per_host=cls.limit_per_host,
+                keepalive_timeout=cls.keepalive_timeout,
+            )
+            cls._session = aiohttp.ClientSession(connector=connector)
+        return cls._session
+
+    # 关闭`ClientSession`，在后台事件循环中执行
+    @classmethod
+    async def close_session(cls):
+        session, cls._session = cls._session, None
+        if session is not None and not session.closed:
+            await session.close()
+
+    # 在后台的事件循环中执行`coro`，阻塞当前线程直到拿到结果
+    @classmethod
+    def run(cls, coro):
+        loop = cls._get_background_loop()
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            coro.close()
+            raise RuntimeError("不能在后台事件循环中同步等待请求，请直接`await`异步方法")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    # 在后台的事件循环中执行`coro`，可以在任何事件循环中`await`，已经在后台事件循环中时直接执行
+    @classmethod
+    async def async_run(cls, coro):
+        loop = cls._get_background_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    # 在后台的事件循环中逐个取出异步生成器`agen`的结果，作为当前事件循环中的异步生成器返回
+    @classmethod
+    async def async_iterate(cls, agen):
+        loop = cls._get_background_loop()
+        if asyncio.get_running_loop() is loop:
+            async for item in agen:
+                yield item
+            return
+        try:
+            while True:
+                try:
+                    yield await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(agen.__anext__(), loop))
+                except StopAsyncIteration:
+                    return
+        finally:
+            # 提前结束迭代时也要关闭生成器，释放连接
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(agen.aclose(), loop))
+
+    # 在后台的事件循环中逐个取出异步生成器`agen`的结果，作为同步的迭代器返回
+    @classmethod
+    def iterate(cls, agen):
+        loop = cls._get_background_loop()
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            raise RuntimeError("不能在后台事件循环中同步等待请求，请直接`await`异步方法")
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            # 提前结束迭代时也要关闭生成器，释放连接
+            asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+    # 逐个读取`Server-Sent Events`响应中每个事件的`data`
+    @classmethod
+    async def iter_sse(cls, response: aiohttp.ClientResponse):
+        data = []
+        async for line in response.content:
+            line = line.decode("utf-8").rstrip("\r\n")
+            if not line:
+                # 空行表示一个事件结束
+                if data:
+                    yield "\n".join(data)
+                    data = []
+                continue
+            if line.startswith("data:"):
+                value = line[len("data:"):]
+                data.append(value[1:] if value.startswith(" ") else value)
+        if data:
+            yield "\n".join(data)
+
+    @classmethod
+    def _get_background_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls._lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=cls._run_background_loop, args=(loop,), name="HTTPClient",
+                                          daemon=True)
+                thread.start()
+                cls._loop = loop
+                atexit.register(cls._shutdown_background_loop)
+            return cls._loop
+
+    # 后台事件循环停止之后关闭，释放事件循环持有的文件描述符
+    @staticmethod
+    def _run_background_loop(loop: asyncio.AbstractEventLoop):
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    # 程序退出时，关闭后台事件循环中的`ClientSession`
+    @classmethod
+    def _shutdown_background_loop(cls):
+        loop = cls._loop
+        if loop is None or not loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(cls.close_session(), loop).result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,67 @@
+import asyncio
+import random
+import threading
+import time
+
+from .model import Model
+
+
+# 本地的模拟模型，不发送网络请求，用于基准测试和调试
+# 返回`prompt`中需要翻译的原文（即"翻译"结果和原文相同），并按照设定的延迟和抖动等待，模拟网络耗时
+# 相同的`seed`和相同的请求顺序，得到的延迟序列也相同
+class MockModel(Model):
+    # 每个请求的平均延迟，单位：秒
+    latency: float
+
+    # 延迟的随机抖动范围，实际延迟在`[latency - jitter, latency + jitter]`之间，单位：秒
+    jitter: float
+
+    # 已经处理的请求数量
+    request_count: int
+
+    supports_streaming: bool = True
+
+    # 流式请求时每一块的字符数
+    STREAM_CHUNK_CHARS = 16
+
+    # 构造函数
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def get_model_name(self) -> str:
+        return "MockModel"
+
+    def make_request(self, prompt) -> (str, bool):
+        time.sleep(self._next_delay())
+        return self._get_source(prompt), True
+
+    async def async_make_request(self, prompt) -> (str, bool):
+        await asyncio.sleep(self._next_delay())
+        return self._get_source(prompt), True
+
+    # 把原文分成几块返回，延迟平均分到每一块上
+    def _send_stream_request(self, prompt):
+        source = self._get_source(prompt)
+        chunks = [source[start:start + self.STREAM_CHUNK_CHARS]
+                  for start in range(0, len(source), self.STREAM_CHUNK_CHARS)] or [""]
+        delay = self._next_delay() / len(chunks)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+
+    def _next_delay(self) -> float:
+        with self._lock:
+            self.request_count += 1
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+        return max(0.0, delay)
+
+    # `prompt`的格式为`说明：原文`，取出第一个`：`之后的原文
+    def _get_source(self, prompt: str) -> str:
+        source = prompt.split("：", 1)[-1]
+        if source.startswith("\n"):
+            source = source[1:]
+        return source
@@ -1,8 +1,35 @@
+import asyncio
+import re
+
+import simplejson
+
+from .exceptions import RateLimitException, RequestTimeoutException
+from .rate_limiter import RequestScheduler
+
 from ..book import Content, ContentType, TableContent
+from ..utils import estimate_tokens
 
 
 class Model:
 
+    # 请求调度器，负责限速和重试，为`None`时直接发送请求
+    scheduler: RequestScheduler = None
+
+    # 结构化翻译时，译文长度超过原文的这个倍数，认为模型输出了多余的内容，译文无效
+    MAX_LENGTH_RATIO = 10
+
+    # 短文本的译文长度不做校验
+    MIN_CHECKED_LENGTH = 50
+
+    # 模型的上下文长度（`prompt`和结果的`token`数之和）
+    context_tokens: int = 4096
+
+    # 流式请求中，两个片段之间最长的等待时间，超过时认为请求已经卡住，提前结束，单位：秒
+    stall_timeout: float = 30
+
+    # 是否支持流式输出，支持时子类实现`_send_stream_request`
+    supports_streaming: bool = False
+
     # 获取`TEXT`类型翻译的`prompt`
     # text: 需要翻译的源文本
     # target_language: 需要翻译的目标文本的语言类型
@@ -15,6 +42,56 @@ class Model:
     def get_table_prompt(self, table: str, target_language: str) -> str:
         return f"翻译为{target_language}，不要添加多余信息，保持间距（空格、分隔符），以表格形式返回：\n{table}"
 
+    # 获取多段`TEXT`合并翻译的`prompt`，每一段以`[[n]]`编号开头
+    # texts: 需要翻译的源文本数组
+    # target_language: 需要翻译的目标文本的语言类型
+    def get_batch_text_prompt(self, texts: [str], target_language: str) -> str:
+        segments = "\n".join(f"[[{idx}]] {text}" for idx, text in enumerate(texts, start=1))
+        return f"翻译为{target_language}，逐段翻译，不要添加多余信息，每一段以原来的编号开头：\n{segments}"
+
+    # 按编号拆分合并翻译的结果，返回`{编号: 译文}`，编号从`1`开始，为空的编号不会出现在结果中
+    # 编号`1..count`必须按顺序各出现一次，否则模型合并、拆分或者丢掉了某些段落，无法确定译文对应哪一段原文，返回`{}`
+    def split_batch_translation(self, translation: str, count: int) -> dict:
+        parts = re.split(r"\[\[(\d+)\]\]", translation)
+        numbers = [int(parts[idx]) for idx in range(1, len(parts) - 1, 2)]
+        if numbers != list(range(1, count + 1)):
+            return {}
+        segments = {}
+        for number, idx in zip(numbers, range(2, len(parts), 2)):
+            text = parts[idx].strip()
+            if text:
+                segments[number] = text
+        return segments
+
+    # 获取结构化翻译的`prompt`，每一段以`JSON`对象的形式发送，`key`是从`1`开始的编号
+    # texts：需要翻译的源文本数组（例如去重后的表格单元格）
+    def get_json_batch_prompt(self, texts: [str], target_language: str) -> str:
+        texts_json = simplejson.dumps({str(idx): text for idx, text in enumerate(texts, start=1)}, ensure_ascii=False)
+        return f"翻译为{target_language}，只翻译JSON的值，保持key不变，只返回JSON，不要添加多余信息：\n{texts_json}"
+
+    # 解析并校验结构化翻译的结果，返回`{编号: 译文}`，编号从`1`开始
+    # 无法解析、为空、或者长度明显异常（模型输出了多余的内容）的编号不会出现在结果中
+    # texts：请求中的源文本数组，用于校验译文
+    def split_json_translation(self, translation: str, texts: [str]) -> dict:
+        start, end = translation.find("{"), translation.rfind("}")
+        if start < 0 or end < start:
+            return {}
+        try:
+            data = simplejson.loads(translation[start:end + 1])
+        except simplejson.JSONDecodeError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        segments = {}
+        for key, value in data.items():
+            if not str(key).isdigit() or not isinstance(value, (str, int, float)): continue
+            number = int(key)
+            text = str(value).strip()
+            if not 1 <= number <= len(texts) or not text: continue
+            if len(text) > max(self.MIN_CHECKED_LENGTH, len(texts[number - 1]) * self.MAX_LENGTH_RATIO): continue
+            segments[number] = text
+        return segments
+
     def get_translate_prompt(self, content: Content, target_language: str) -> str:
         if content.content_type == ContentType.TEXT:
             return self.get_text_prompt(content.original, target_language)
@@ -22,5 +99,99 @@ class Model:
             content: TableContent
             return self.get_table_prompt(content.get_original_as_str(), target_language)
 
+    # 模型的名称，用来区分不同模型的翻译结果（例如翻译缓存的`key`）
+    def get_model_name(self) -> str:
+        return self.__class__.__name__
+
+    # 设置请求调度器，多个模型可以共用同一个调度器
+    def set_scheduler(self, scheduler: RequestScheduler):
+        self.scheduler = scheduler
+
+    # 单次请求中原文最多的`token`数：上下文中还要放下`prompt`的说明和译文（译文可能比原文长）
+    def get_max_segment_tokens(self) -> int:
+        return self.context_tokens // 3
+
+    # 根据`prompt`的长度计算结果的`token`数上限，不超过上下文中剩余的部分
+    def get_max_output_tokens(self, prompt: str) -> int:
+        prompt_tokens = estimate_tokens(prompt)
+        return max(1, min(self.context_tokens - prompt_tokens, prompt_tokens * 2 + 64))
+
+    # 估算一次请求消耗的`token`数，译文和原文的长度大致相当
+    def estimate_request_tokens(self, prompt: str) -> int:
+        return estimate_tokens(prompt) * 2
+
     def make_request(self, prompt) -> (str, bool):
         raise NotImplementedError("子类必须实现该方法")
+
+    # 流式请求，逐个返回译文的片段，只等待调度器的限速，不重试（已经返回的片段无法撤回）
+    # 不支持流式输出时，一次性返回完整的结果
+    def stream_request(self, prompt):
+        if not self.supports_streaming:
+            translation, status = self.make_request(prompt)
+            if not status:
+                raise Exception(f"请求失败：{translation}")
+            yield translation
+            return
+        self.wait_for_scheduler(prompt)
+        yield from self._send_stream_request(prompt)
+
+    # 发送一次流式请求，不经过调度器，逐个返回译文的片段
+    def _send_stream_request(self, prompt):
+        raise NotImplementedError("子类必须实现该方法")
+
+    # `stream_request`的异步版本
+    async def async_stream_request(self, prompt):
+        translation, status = await self.async_make_request(prompt)
+        if not status:
+            raise Exception(f"请求失败：{translation}")
+        yield translation
+
+    # 以流式请求获取完整的结果，每收到一个片段调用一次`on_chunk(chunk)`，返回`(translation, status)`
+    # 和`make_request`一样通过调度器发送，被限流或卡住时整体重试
+    def make_streaming_request(self, prompt, on_chunk=None) -> (str, bool):
+        if not self.supports_streaming:
+            # `make_request`已经通过调度器重试
+            return self._collect_stream(self.stream_request(prompt), on_chunk)
+        return self.schedule_request(lambda item: self._collect_stream(self._send_stream_request(item), on_chunk),
+                                     prompt)
+
+    # 读完流式请求的所有片段，片段已经交给`on_chunk`之后被限流或卡住时无法撤回，不再重试
+    @staticmethod
+    def _collect_stream(stream, on_chunk=None) -> (str, bool):
+        chunks = []
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+        except (RateLimitException, RequestTimeoutException) as e:
+            if on_chunk and chunks:
+                raise Exception(f"流式请求中断：{e}")
+            raise
+        return "".join(chunks).strip(), True
+
+    # 流式请求开始之前，等待调度器的限速
+    def wait_for_scheduler(self, prompt):
+        if self.scheduler is not None:
+            self.scheduler.wait(self.estimate_request_tokens(prompt))
+
+    async def async_wait_for_scheduler(self, prompt):
+        if self.scheduler is not None:
+            await self.scheduler.async_wait(self.estimate_request_tokens(prompt))
+
+    # 通过调度器发送同步请求，`send`接收`prompt`并返回请求结果
+    def schedule_request(self, send, prompt) -> (str, bool):
+        if self.scheduler is None:
+            return send(prompt)
+        return self.scheduler.call(lambda: send(prompt), self.estimate_request_tokens(prompt))
+
+    # 通过调度器发送异步请求，`send`接收`prompt`并返回协程
+    async def async_schedule_request(self, send, prompt) -> (str, bool):
+        if self.scheduler is None:
+            return await send(prompt)
+        return await self.scheduler.async_call(lambda: send(prompt), self.estimate_request_tokens(prompt))
+
+    # `make_request`的异步版本，子类没有实现时，就在线程池中执行同步的`make_request`
+    async def async_make_request(self, prompt) -> (str, bool):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.make_request, prompt)
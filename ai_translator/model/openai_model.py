@@ -3,61 +3,124 @@ import requests
 
 from simplejson import errors as simplejson_errors
 
+from .exceptions import RateLimitException, RequestTimeoutException, parse_retry_after
 from .model import Model
 
-from ..utils import LOG
-
 
 class OpenAIModel(Model):
     # 模型名称
     model: str
 
+    # 建立连接的超时时间，单位：秒
+    CONNECT_TIMEOUT = 10
+
+    supports_streaming: bool = True
+
+    # 各个模型的上下文长度，没有列出的模型使用默认值
+    CONTEXT_TOKENS = {
+        "gpt-3.5-turbo": 4096,
+        "gpt-3.5-turbo-16k": 16384,
+        "gpt-4": 8192,
+        "text-davinci-003": 4097,
+    }
+
     def __init__(self, model: str, api_key: str):
         self.model = model
+        self.context_tokens = self.CONTEXT_TOKENS.get(model, Model.context_tokens)
         openai.api_key = api_key
 
+    def get_model_name(self) -> str:
+        return f"OpenAIModel:{self.model}"
+
     def make_request(self, prompt) -> (str, bool):
+        debug_translation = self._get_debug_translation(prompt)
+        if debug_translation is not None:
+            return debug_translation, True
+
+        return self.schedule_request(self._send_request, prompt)
+
+    # 流式请求，`request_timeout`的第二个值是两次读到数据之间的最长间隔，超过时认为流已经卡住
+    def _send_stream_request(self, prompt):
+        debug_translation = self._get_debug_translation(prompt)
+        if debug_translation is not None:
+            yield debug_translation
+            return
+
+        try:
+            if self.model == "gpt-3.5-turbo":
+                response = openai.ChatCompletion.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    stream=True,
+                    request_timeout=(self.CONNECT_TIMEOUT, self.stall_timeout)
+                )
+                for chunk in response:
+                    text = chunk.choices[0].delta.get('content')
+                    if text:
+                        yield text
+            else:
+                response = openai.Completion.create(
+                    model=self.model,
+                    prompt=prompt,
+                    max_tokens=self.get_max_output_tokens(prompt),
+                    temperature=0,
+                    stream=True,
+                    request_timeout=(self.CONNECT_TIMEOUT, self.stall_timeout)
+                )
+                for chunk in response:
+                    text = chunk.choices[0].text
+                    if text:
+                        yield text
+        except Exception as e:
+            raise self._convert_exception(e)
+
+    # `Debug`调试使用：没有配置`APIKey`时，直接返回`prompt`中的原文
+    def _get_debug_translation(self, prompt) -> str:
+        if "请输入你自己的" not in openai.api_key:
+            return None
+        text_0 = "翻译为中文，不要添加多余信息："
+        text_1 = "翻译为中文，不要添加多余信息，保持间距（空格、分隔符），以表格形式返回：\n"
+        text_2 = "翻译为中文，逐段翻译，不要添加多余信息，每一段以原来的编号开头：\n"
+        text_3 = "翻译为中文，只翻译JSON的值，保持key不变，只返回JSON，不要添加多余信息：\n"
+        for text in (text_3, text_2, text_1, text_0):
+            if text in prompt:
+                return prompt[len(text):]
+        return None
+
+    def _send_request(self, prompt) -> (str, bool):
+        try:
+            if self.model == "gpt-3.5-turbo":
+                response = openai.ChatCompletion.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                )
+                translation = response.choices[0].message['content'].strip()
+            else:
+                response = openai.Completion.create(
+                    model=self.model,
+                    prompt=prompt,
+                    max_tokens=self.get_max_output_tokens(prompt),
+                    temperature=0
+                )
+                translation = response.choices[0].text.strip()
+            return translation, True
+        except Exception as e:
+            raise self._convert_exception(e)
 
-        # `Debug`调试使用
-        if "请输入你自己的" in openai.api_key:
-            text_0 = "翻译为中文，不要添加多余信息："
-            text_1 = "翻译为中文，不要添加多余信息，保持间距（空格、分隔符），以表格形式返回：\n"
-            if text_1 in prompt:
-                return prompt[len(text_1):], True
-            if text_0 in prompt:
-                return prompt[len(text_0):], True
-
-        attempts = 0
-        while attempts < 3:
-            try:
-                if self.model == "gpt-3.5-turbo":
-                    response = openai.ChatCompletion.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "user", "content": prompt}
-                        ]
-                    )
-                    translation = response.choices[0].message['content'].strip()
-                else:
-                    response = openai.Completion.create(
-                        model=self.model,
-                        prompt=prompt,
-                        max_tokens=150,
-                        temperature=0
-                    )
-                    translation = response.choices[0].text.strip()
-                return translation, True
-            except openai.error.RateLimitError:
-                attempts += 1
-                if attempts < 3:
-                    LOG.warning("请求频率受限，等待60秒之后重试")
-                else:
-                    raise Exception("请求受限，已达到最大请求次数限制")
-            except requests.exceptions.Timeout as e:
-                raise Exception(f"请求超时：{e}")
-            except requests.exceptions.RequestException as e:
-                raise Exception(f"请求异常：{e}")
-            except simplejson_errors.JSONDecodeError as e:
-                raise Exception("JSON解析错误：{e}")
-            except Exception as e:
-                raise Exception(f"发生了未知错误：{e}")
+    # 将`openai`和`requests`的异常转换成统一的异常，限流和超时交给调度器重试
+    @staticmethod
+    def _convert_exception(e: Exception) -> Exception:
+        if isinstance(e, openai.error.RateLimitError):
+            headers = getattr(e, "headers", None) or {}
+            return RateLimitException(f"请求频率受限：{e}", parse_retry_after(headers.get("Retry-After")))
+        if isinstance(e, (openai.error.Timeout, requests.exceptions.Timeout)):
+            return RequestTimeoutException(f"请求超时：{e}")
+        if isinstance(e, requests.exceptions.RequestException):
+            return Exception(f"请求异常：{e}")
+        if isinstance(e, simplejson_errors.JSONDecodeError):
+            return Exception(f"JSON解析错误：{e}")
+        return Exception(f"发生了未知错误：{e}")
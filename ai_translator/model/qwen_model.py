@@ -1,8 +1,13 @@
-import requests
+import asyncio
+
+import aiohttp
+import simplejson
 
 from simplejson import errors as simplejson_errors
 
+from .exceptions import RateLimitException, RequestTimeoutException, parse_retry_after
 from .model import Model
+from .http_client import HTTPClient
 
 
 class QWenModel(Model):
@@ -15,12 +20,78 @@ class QWenModel(Model):
     # 请求超时的时间，单位：秒
     timeout: int
 
+    supports_streaming: bool = True
+
+    # `qwen-v1`的上下文长度
+    context_tokens: int = 6000
+
     def __init__(self, api_url: str, api_key: str, timeout: int):
         self.api_url = api_url
         self.api_key = api_key
         self.timeout = timeout
 
+    def get_model_name(self) -> str:
+        return "QWenModel:qwen-v1"
+
+    # 同步请求，交给`HTTPClient`的后台事件循环执行，和异步请求共用连接池
     def make_request(self, prompt) -> (str, bool):
+        return HTTPClient.run(self.async_make_request(prompt))
+
+    # 在任何事件循环中调用时，请求都交给`HTTPClient`的后台事件循环执行，共用连接池
+    async def async_make_request(self, prompt) -> (str, bool):
+        return await HTTPClient.async_run(self.async_schedule_request(self._async_send_request, prompt))
+
+    # 流式请求，交给`HTTPClient`的后台事件循环执行
+    def _send_stream_request(self, prompt):
+        return HTTPClient.iterate(self._async_send_stream_request(prompt))
+
+    # 异步流式请求，只等待调度器的限速，不重试
+    async def async_stream_request(self, prompt):
+        await self.async_wait_for_scheduler(prompt)
+        async for chunk in HTTPClient.async_iterate(self._async_send_stream_request(prompt)):
+            yield chunk
+
+    # 通过`SSE`逐个返回译文的片段（`incremental_output`：每个事件只包含新增的部分）
+    async def _async_send_stream_request(self, prompt):
+        try:
+            payload = {
+                "model": "qwen-v1",
+                "input": {
+                    "prompt": prompt
+                },
+                "parameters": {
+                    "incremental_output": True
+                }
+            }
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Accept": "text/event-stream",
+                "X-DashScope-SSE": "enable"
+            }
+            session = HTTPClient.get_session()
+            # `sock_read`：两次读到数据之间的最长间隔，超过时认为流已经卡住
+            timeout = aiohttp.ClientTimeout(total=self.timeout, sock_read=self.stall_timeout)
+            async with session.post(url=self.api_url, headers=headers, json=payload, timeout=timeout) as response:
+                if response.status in (429, 503):
+                    raise RateLimitException(f"请求频率受限：{response.status}",
+                                             parse_retry_after(response.headers.get("Retry-After")))
+                response.raise_for_status()
+                async for data in HTTPClient.iter_sse(response):
+                    text = simplejson.loads(data).get('output', {}).get('text')
+                    if text:
+                        yield text
+        except RateLimitException:
+            raise
+        except asyncio.TimeoutError as e:
+            raise RequestTimeoutException(f"流式请求超过{self.stall_timeout}秒没有返回数据：{e}")
+        except aiohttp.ClientError as e:
+            raise Exception(f"请求异常：{e}")
+        except simplejson_errors.JSONDecodeError as e:
+            raise Exception(f"JSON解析错误：{e}")
+        except Exception as e:
+            raise Exception(f"发生了未知错误：{e}")
+
+    async def _async_send_request(self, prompt) -> (str, bool):
         try:
             payload = {
                 "model": "qwen-v1",
@@ -33,16 +104,23 @@ class QWenModel(Model):
             headers = {
                 "Authorization": f"Bearer {self.api_key}"
             }
-            response = requests.post(url=self.api_url, headers=headers, json=payload, timeout=self.timeout)
-            response.raise_for_status()
-            response_dict = response.json()
+            session = HTTPClient.get_session()
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with session.post(url=self.api_url, headers=headers, json=payload, timeout=timeout) as response:
+                if response.status in (429, 503):
+                    raise RateLimitException(f"请求频率受限：{response.status}",
+                                             parse_retry_after(response.headers.get("Retry-After")))
+                response.raise_for_status()
+                response_dict = await response.json(loads=simplejson.loads, content_type=None)
             translation = response_dict['output']['text']
             return translation, True
-        except requests.exceptions.Timeout as e:
-            raise Exception(f"请求超时：{e}")
-        except requests.exceptions.RequestException as e:
+        except RateLimitException:
+            raise
+        except asyncio.TimeoutError as e:
+            raise RequestTimeoutException(f"请求超时：{e}")
+        except aiohttp.ClientError as e:
             raise Exception(f"请求异常：{e}")
         except simplejson_errors.JSONDecodeError as e:
-            raise Exception("JSON解析错误：{e}")
+            raise Exception(f"JSON解析错误：{e}")
         except Exception as e:
-            return Exception(f"发生了未知错误：{e}")
+            raise Exception(f"发生了未知错误：{e}")
@@ -0,0 +1,199 @@
+import asyncio
+import random
+import threading
+import time
+
+from .exceptions import RateLimitException, RequestTimeoutException
+
+from ..utils import LOG, METRICS
+
+
+class TokenBucket:
+
+    # 每秒补充的令牌数量
+    rate: float
+
+    # 桶的容量，即允许的突发数量
+    capacity: float
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    # 预约`amount`个令牌，返回拿到令牌之前需要等待的秒数
+    # 令牌不足时余额会变为负数，后来的请求排在后面等待，这样等待的请求之间不会互相争抢
+    # 超过桶容量的请求也按实际的数量扣除，等余额恢复之后再发送，不会超过配置的速度
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    # 调整补充速度，容量保持不变
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+
+class RequestScheduler:
+
+    # 每分钟的请求数上限，为`None`时不限制
+    requests_per_minute: float
+
+    # 每分钟的`token`数上限，为`None`时不限制
+    tokens_per_minute: float
+
+    # 被限流或超时后的最大重试次数
+    max_retries: int
+
+    # 指数退避的初始等待时间和最长等待时间，单位：秒
+    base_delay: float
+    max_delay: float
+
+    # 被限流或超时时速度减半，最低降到配置速度的这个比例
+    min_rate_ratio: float
+
+    # 每次请求成功后速度恢复的比例
+    increase_step: float
+
+    # 两次降速之间的最短间隔，单位：秒，避免同一批并发请求同时被限流时速度被连续减半
+    DECREASE_INTERVAL = 1.0
+
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0, min_rate_ratio: float = 0.1,
+                 increase_step: float = 0.05):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_rate_ratio = min_rate_ratio
+        self.increase_step = increase_step
+
+        self._request_bucket = self._new_bucket(requests_per_minute)
+        self._token_bucket = self._new_bucket(tokens_per_minute)
+        self._rate_ratio = 1.0
+        # 服务端返回`Retry-After`之后，所有请求都要等到这个时间点之后再发送
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+
+    # 根据配置文件中模型的配置创建调度器，没有配置限速时也会创建，用于超时和限流的重试
+    @classmethod
+    def from_config(cls, config: dict) -> "RequestScheduler":
+        config = config or {}
+        return cls(requests_per_minute=config.get("requests_per_minute"),
+                   tokens_per_minute=config.get("tokens_per_minute"),
+                   max_retries=config.get("max_retries", 5))
+
+    # 执行同步请求，`send`没有参数，`tokens`是这次请求预计消耗的`token`数
+    def call(self, send, tokens: int = 0):
+        attempt = 0
+        while True:
+            time.sleep(self._reserve(tokens))
+            try:
+                result = send()
+            except (RateLimitException, RequestTimeoutException) as e:
+                delay = self._on_failure(e, attempt)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._on_success()
+            return result
+
+    # `call`的异步版本，`send`没有参数，返回协程
+    async def async_call(self, send, tokens: int = 0):
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._reserve(tokens))
+            try:
+                result = await send()
+            except (RateLimitException, RequestTimeoutException) as e:
+                delay = self._on_failure(e, attempt)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._on_success()
+            return result
+
+    # 只等待限速，不重试，用于流式请求（已经返回的片段无法撤回，不能整体重试）
+    def wait(self, tokens: int = 0):
+        time.sleep(self._reserve(tokens))
+
+    # `wait`的异步版本
+    async def async_wait(self, tokens: int = 0):
+        await asyncio.sleep(self._reserve(tokens))
+
+    # 当前速度占配置速度的比例
+    def get_rate_ratio(self) -> float:
+        return self._rate_ratio
+
+    # 预约请求数和`token`数，返回发送之前需要等待的秒数
+    def _reserve(self, tokens: int) -> float:
+        delay = max(0.0, self._paused_until - time.monotonic())
+        if self._request_bucket is not None:
+            delay = max(delay, self._request_bucket.reserve(1))
+        if self._token_bucket is not None and tokens > 0:
+            delay = max(delay, self._token_bucket.reserve(tokens))
+        return delay
+
+    # 请求失败时降速，返回重试之前需要等待的秒数，超过重试次数时抛出异常
+    def _on_failure(self, error: Exception, attempt: int) -> float:
+        reason = "rate_limit" if isinstance(error, RateLimitException) else "timeout"
+        if attempt >= self.max_retries:
+            METRICS.inc("model_retries_exhausted_total", reason=reason)
+            raise Exception(f"请求受限，已达到最大请求次数限制：{error}")
+
+        METRICS.inc("model_retries_total", reason=reason)
+
+        # 指数退避，随机抖动避免所有请求同时重试
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = random.uniform(delay / 2, delay)
+
+        # 被限流和超时都说明服务端已经过载，速度减半
+        with self._lock:
+            now = time.monotonic()
+            if now - self._decreased_at >= self.DECREASE_INTERVAL:
+                self._decreased_at = now
+                self._set_rate_ratio(max(self.min_rate_ratio, self._rate_ratio / 2))
+            if isinstance(error, RateLimitException) and error.retry_after is not None:
+                delay = max(delay, error.retry_after)
+                self._paused_until = max(self._paused_until, now + error.retry_after)
+
+        if isinstance(error, RateLimitException):
+            LOG.warning(f"请求频率受限，降速到{self._rate_ratio:.0%}，等待{delay:.1f}秒之后重试")
+        else:
+            LOG.warning(f"请求超时，降速到{self._rate_ratio:.0%}，等待{delay:.1f}秒之后重试：{error}")
+        return delay
+
+    # 请求成功时逐步恢复速度
+    def _on_success(self):
+        if self._rate_ratio >= 1.0:
+            return
+        with self._lock:
+            self._set_rate_ratio(min(1.0, self._rate_ratio + self.increase_step))
+
+    def _set_rate_ratio(self, ratio: float):
+        self._rate_ratio = ratio
+        if self._request_bucket is not None:
+            self._request_bucket.set_rate(self.requests_per_minute / 60 * ratio)
+        if self._token_bucket is not None:
+            self._token_bucket.set_rate(self.tokens_per_minute / 60 * ratio)
+
+    @staticmethod
+    def _new_bucket(per_minute: float) -> TokenBucket:
+        if not per_minute:
+            return None
+        # 容量取一秒的量（至少为`1`），避免开始时一次性发出整分钟的请求
+        return TokenBucket(per_minute / 60, max(1.0, per_minute / 60))
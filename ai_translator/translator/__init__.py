@@ -1,2 +1,6 @@
 from .exceptions import PageOutOfRangeException
-from .pdf_transtor import PDFTranslator
\ No newline at end of file
+from .pdf_transtor import PDFTranslator
+from .translation_cache import TranslationCache
+from .image_cache import ImageCache
+from .job_queue import JobQueue
+from .batch_translator import BatchTranslator
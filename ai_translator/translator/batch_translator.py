@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+from ..model import Model
+from ..utils import LOG, METRICS
+
+from .image_cache import ImageCache
+from .job_queue import JobQueue
+from .pdf_transtor import PDFTranslator
+from .translation_cache import TranslationCache
+
+
+# 批量翻译：多个工作线程从任务队列中取出`PDF`文件，各自使用一个`PDFTranslator`翻译
+# 所有工作线程共用同一个模型、翻译缓存和模型请求的并发上限，每完成一个任务就更新任务清单
+class BatchTranslator:
+    model: Model
+
+    queue: JobQueue
+
+    # 翻译缓存，为`None`时不使用缓存
+    cache: TranslationCache
+
+    # 图片缓存，为`None`时不使用缓存
+    image_cache: ImageCache
+
+    # 同时翻译的`PDF`文件数量
+    book_workers: int
+
+    # 所有`PDF`文件同时进行中的模型请求总数上限
+    max_concurrent_requests: int
+
+    # 任务清单的路径，为空时不写入
+    manifest_path: str
+
+    # 每个任务最多尝试的次数
+    max_attempts: int
+
+    # 是否使用流式请求
+    stream_responses: bool
+
+    # 构造函数
+    def __init__(self, model: Model, queue: JobQueue, cache: TranslationCache = None, book_workers: int = 1,
+                 max_concurrent_requests: int = 4, manifest_path: str = None, max_attempts: int = 2,
+                 stream_responses: bool = False, image_cache: ImageCache = None):
+        self.model = model
+        self.queue = queue
+        self.cache = cache
+        self.book_workers = book_workers
+        self.max_concurrent_requests = max_concurrent_requests
+        self.manifest_path = manifest_path
+        self.max_attempts = max_attempts
+        self.stream_responses = stream_responses
+        self.image_cache = image_cache
+        self._request_limit = threading.BoundedSemaphore(max_concurrent_requests)
+        self._manifest_lock = threading.Lock()
+
+    # 处理队列中的所有任务，直到没有等待中的任务，返回各个状态的任务数量
+    # translate_options：传给`PDFTranslator.translate_pdf()`的参数，例如`max_workers`、`batch_chars`
+    def run(self, **translate_options) -> dict:
+        # 上一次运行被中断的任务重新放回队列，会从断点记录中恢复
+        requeued = self.queue.requeue_running()
+        if requeued:
+            LOG.info(f"有 {requeued} 个任务在上一次运行中被中断，重新翻译")
+
+        self._write_manifest()
+
+        workers = [threading.Thread(target=self._work, kwargs=translate_options, name=f"book-worker-{idx}",
+                                    daemon=True)
+                   for idx in range(self.book_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        summary = self.queue.count_by_status()
+        LOG.info(f"批量翻译结束：{summary}")
+        return summary
+
+    # 工作线程：不断取出任务并翻译，队列为空时结束
+    def _work(self, **translate_options):
+        while True:
+            job = self.queue.claim()
+            if job is None:
+                return
+            self._write_manifest()
+            self._run_job(job, **translate_options)
+            self._write_manifest()
+
+    def _run_job(self, job: dict, **translate_options):
+        pdf_file_path = job["pdf_file_path"]
+        LOG.info(f"开始翻译任务 {job['id']}（第 {job['attempts']} 次）：{pdf_file_path}")
+
+        output_file_path = job["output_file_path"]
+        if output_file_path:
+            os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+
+        translator = PDFTranslator(self.model, self.cache, stream_responses=self.stream_responses,
+                                   request_limit=self._request_limit, image_cache=self.image_cache)
+        started_at = time.perf_counter()
+        try:
+            # 总是从断点记录中恢复，重试或者服务重启后不会重复翻译已经完成的部分
+            translator.translate_pdf(pdf_file_path, job["file_format"], output_file_path=output_file_path,
+                                     resume=True, **translate_options)
+        except Exception as e:
+            LOG.error(f"任务 {job['id']} 翻译失败：{e}")
+            METRICS.inc("batch_jobs_total", status="error")
+            self.queue.fail(job["id"], str(e), self.max_attempts)
+            return
+
+        seconds = time.perf_counter() - started_at
+        METRICS.inc("batch_jobs_total", status="done")
+        METRICS.observe("batch_job_seconds", seconds)
+        self.queue.complete(job["id"], {
+            "output_file_path": translator.writer.get_output_file_path(pdf_file_path, output_file_path,
+                                                                       job["file_format"]),
+            "seconds": round(seconds, 3),
+            "skipped": translator.skip_classifier.stats()["skipped"],
+            "coalesced": translator.coalescer.get_coalesced_count(),
+        })
+        LOG.info(f"任务 {job['id']} 翻译完成，耗时 {seconds:.1f} 秒：{pdf_file_path}")
+
+    def _write_manifest(self):
+        if not self.manifest_path:
+            return
+        with self._manifest_lock:
+            self.queue.write_manifest(self.manifest_path)
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import threading
+
+from ..utils import METRICS
+
+
+# 按内容寻址的图片缓存：图片数据以摘要命名保存在缓存目录中，同一本书（或者不同的书）再次运行时，相同的图片不再重复写入
+# 文件一旦写入就不再修改，多个任务同时使用同一个目录也不会互相影响
+class ImageCache:
+    # 缓存目录的路径
+    cache_dir: str
+
+    # 命中次数
+    hits: int
+
+    # 未命中次数
+    misses: int
+
+    # 构造函数
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        # 如果文件夹的路径不存在，就创建
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # 计算图片数据的摘要
+    @classmethod
+    def digest(cls, data: bytes) -> str:
+        return hashlib.sha1(data).hexdigest()
+
+    # 获取图片文件的路径，缓存中没有时先写入，`digest`为`None`时根据`data`计算
+    def get_path(self, data: bytes, image_format: str, digest: str = None) -> str:
+        digest = digest or self.digest(data)
+        path = os.path.join(self.cache_dir, digest[:2], f"{digest}.{image_format}")
+        if os.path.exists(path):
+            self._count(True)
+            return path
+
+        self._count(False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，其他任务不会读到写了一半的文件
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as image_file:
+            image_file.write(data)
+        os.replace(temp_path, path)
+        return path
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        METRICS.inc("image_cache_requests_total", result="hit" if hit else "miss")
@@ -0,0 +1,206 @@
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import simplejson
+
+from ..utils import LOG
+
+from .writer import Writer
+
+
+# 基于`SQLite`的翻译任务队列，每个任务对应一个`PDF`文件
+# 任务的状态：`pending`（等待）、`running`（进行中）、`done`（完成）、`failed`（失败）
+# 队列保存在文件中，进程退出后重新运行，会继续处理没有完成的任务
+class JobQueue:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    # 队列文件的路径
+    queue_path: str
+
+    # 构造函数
+    def __init__(self, queue_path: str):
+        self.queue_path = queue_path
+        self._lock = threading.Lock()
+
+        # 如果文件夹的路径不存在，就创建
+        folder = os.path.dirname(queue_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self._conn = sqlite3.connect(queue_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pdf_file_path TEXT NOT NULL,
+                output_file_path TEXT,
+                file_format TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                UNIQUE (pdf_file_path, file_format)
+            )
+        """)
+        self._conn.commit()
+
+    # 添加任务，同一个`PDF`和格式已经在队列中时不重复添加，返回是否添加成功
+    # 输出文件（以及它的断点记录）已经属于其他任务时，在文件名中加上源文件路径的摘要，避免互相覆盖
+    def add(self, pdf_file_path: str, file_format: str, output_file_path: str = None) -> bool:
+        pdf_file_path = os.path.abspath(pdf_file_path)
+        if output_file_path is None:
+            output_file_path = self._get_output_file_path(pdf_file_path, file_format, os.path.dirname(pdf_file_path))
+        with self._lock:
+            if self._is_output_taken(pdf_file_path, file_format, output_file_path):
+                root, extension = os.path.splitext(output_file_path)
+                digest = hashlib.sha1(f"{pdf_file_path}|{file_format}".encode("utf-8")).hexdigest()[:8]
+                unique_file_path = f"{root}_{digest}{extension}"
+                LOG.warning(f"输出文件 {output_file_path} 已经属于其他任务，改为 {unique_file_path}：{pdf_file_path}")
+                output_file_path = unique_file_path
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO job (pdf_file_path, output_file_path, file_format, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (pdf_file_path, output_file_path, file_format, self.PENDING, time.time()))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    # 添加目录中的所有`PDF`文件，或者匹配`glob`模式的文件，返回添加的任务数量
+    # 指定了输出目录时，按照`PDF`文件相对于输入目录的路径，在输出目录中建立相同的子目录
+    def add_from_source(self, source: str, file_format: str, output_dir: str = None) -> int:
+        if os.path.isdir(source):
+            pdf_file_paths = glob.glob(os.path.join(source, "**", "*.pdf"), recursive=True)
+        else:
+            pdf_file_paths = glob.glob(source, recursive=True)
+        source_root = self._get_source_root(source)
+
+        added = 0
+        for pdf_file_path in sorted(pdf_file_paths):
+            output_file_path = None
+            if output_dir:
+                relative_dir = os.path.dirname(os.path.relpath(pdf_file_path, source_root))
+                output_file_path = self._get_output_file_path(pdf_file_path, file_format,
+                                                              os.path.join(output_dir, relative_dir))
+            if self.add(pdf_file_path, file_format, output_file_path):
+                added += 1
+        return added
+
+    # 取出一个等待中的任务，并标记为进行中，没有任务时返回`None`
+    def claim(self) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM job WHERE status = ? ORDER BY id LIMIT 1", (self.PENDING,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE job SET status = ?, attempts = attempts + 1, started_at = ?, error = NULL WHERE id = ?",
+                (self.RUNNING, time.time(), row["id"]))
+            self._conn.commit()
+            job = dict(row)
+            job["attempts"] += 1
+            return job
+
+    # 任务完成，`result`是任务的结果（输出文件、耗时等）
+    def complete(self, job_id: int, result: dict):
+        self._finish(job_id, self.DONE, None, result)
+
+    # 任务失败，还没有超过重试次数时重新放回队列
+    def fail(self, job_id: int, error: str, max_attempts: int):
+        with self._lock:
+            attempts = self._conn.execute("SELECT attempts FROM job WHERE id = ?", (job_id,)).fetchone()["attempts"]
+        status = self.PENDING if attempts < max_attempts else self.FAILED
+        self._finish(job_id, status, error, None)
+
+    # 上一次运行被中断时，进行中的任务重新放回队列，中断不计入尝试次数
+    def requeue_running(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE job SET status = ?, attempts = MAX(attempts - 1, 0) WHERE status = ?",
+                (self.PENDING, self.RUNNING))
+            self._conn.commit()
+            return cursor.rowcount
+
+    # 失败的任务重新放回队列，重新计算重试次数
+    def requeue_failed(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE job SET status = ?, attempts = 0 WHERE status = ?", (self.PENDING, self.FAILED))
+            self._conn.commit()
+            return cursor.rowcount
+
+    # 所有任务
+    def list_jobs(self) -> [dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM job ORDER BY id").fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job["result"] = simplejson.loads(job["result"]) if job["result"] else None
+            jobs.append(job)
+        return jobs
+
+    # 各个状态的任务数量
+    def count_by_status(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM job GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    # 将所有任务的状态和结果写入清单文件（`JSON`），先写临时文件再替换，读取方不会读到写了一半的文件
+    def write_manifest(self, manifest_path: str):
+        folder = os.path.dirname(manifest_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        manifest = {
+            "updated_at": time.time(),
+            "summary": self.count_by_status(),
+            "jobs": self.list_jobs(),
+        }
+        temp_path = manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            simplejson.dump(manifest, manifest_file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, manifest_path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _finish(self, job_id: int, status: str, error: str, result: dict):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job SET status = ?, error = ?, result = ?, finished_at = ? WHERE id = ?",
+                (status, error, simplejson.dumps(result, ensure_ascii=False) if result else None, time.time(), job_id))
+            self._conn.commit()
+
+    # 其他任务（不同的`PDF`或格式）是否已经使用了这个输出文件
+    def _is_output_taken(self, pdf_file_path: str, file_format: str, output_file_path: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM job WHERE output_file_path = ? AND NOT (pdf_file_path = ? AND file_format = ?) LIMIT 1",
+            (output_file_path, pdf_file_path, file_format)).fetchone()
+        return row is not None
+
+    # 输入的根目录：目录本身，或者`glob`模式中第一个通配符之前的目录
+    @staticmethod
+    def _get_source_root(source: str) -> str:
+        if os.path.isdir(source):
+            return source
+        root = os.path.dirname(source)
+        while glob.has_magic(root):
+            root = os.path.dirname(root)
+        return root or "."
+
+    # 输出文件放在`output_dir`中，文件名和`Writer`的默认输出文件相同
+    @staticmethod
+    def _get_output_file_path(pdf_file_path: str, file_format: str, output_dir: str) -> str:
+        extension = Writer.get_output_extension(file_format)
+        name = os.path.splitext(os.path.basename(pdf_file_path))[0]
+        return os.path.join(os.path.abspath(output_dir), f"{name}_translated{extension}")
@@ -0,0 +1,88 @@
+import queue
+import threading
+
+from typing import Callable, Iterable, Iterator
+
+
+# 用有界队列把多个处理阶段串起来，每个阶段在单独的线程中运行
+# 例如：解析第`N+1`页、翻译第`N`页、写入第`N-1`页可以同时进行，队列满了之后上游会等待，所以内存占用只和队列长度有关
+class PagePipeline:
+    # 每个队列中最多缓存的数量
+    queue_size: int
+
+    # 队列结束的标记
+    _END = object()
+
+    # 检查是否需要停止的间隔，单位：秒
+    _POLL_INTERVAL = 0.1
+
+    # 构造函数
+    def __init__(self, queue_size: int = 2):
+        self.queue_size = queue_size
+
+    # 运行流水线，返回最后一个阶段输出的迭代器，在调用方的线程中消费
+    # source：第一个阶段，返回可迭代对象
+    # stages：之后的每个阶段，接收上一个阶段输出的迭代器，返回可迭代对象
+    def run(self, source: Callable[[], Iterable], stages: [Callable[[Iterator], Iterable]]) -> Iterator:
+        stop = threading.Event()
+        threads = []
+
+        output = queue.Queue(maxsize=self.queue_size)
+        threads.append(self._start_stage(lambda: source(), output, stop))
+
+        for stage in stages:
+            stage_input = self._iter_queue(output, stop)
+            output = queue.Queue(maxsize=self.queue_size)
+            threads.append(self._start_stage(lambda stage=stage, stage_input=stage_input: stage(stage_input), output, stop))
+
+        try:
+            yield from self._iter_queue(output, stop)
+        finally:
+            # 下游提前结束或者出错时，通知上游的阶段停止
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _start_stage(self, produce: Callable[[], Iterable], output: queue.Queue, stop: threading.Event) -> threading.Thread:
+
+        def target():
+            try:
+                for item in produce():
+                    if not self._put(output, item, stop):
+                        return
+                self._put(output, self._END, stop)
+            except BaseException as e:
+                self._put(output, _StageError(e), stop)
+
+        thread = threading.Thread(target=target, name="PagePipeline", daemon=True)
+        thread.start()
+        return thread
+
+    # 放入队列，队列满时等待，返回`False`表示流水线已经停止
+    def _put(self, output: queue.Queue, item: any, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                output.put(item, timeout=self._POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    # 从队列中逐个取出，上游出错时，在下游重新抛出异常
+    def _iter_queue(self, source: queue.Queue, stop: threading.Event) -> Iterator:
+        while not stop.is_set():
+            try:
+                item = source.get(timeout=self._POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is self._END:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+
+
+class _StageError:
+
+    def __init__(self, error: BaseException):
+        self.error = error
@@ -1,6 +1,12 @@
+import math
+
 import pdfplumber
 
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from operator import itemgetter
+from typing import Iterator
 
 from ..book import Book, Page, Content, ContentType, TableContent, ImageContent
 from ..utils import LOG
@@ -10,29 +16,81 @@ from .exceptions import PageOutOfRangeException
 
 class PDFParser:
 
+    # 多进程解析时，每个进程分到的页码段数
+    CHUNKS_PER_WORKER = 4
+
+    # 统计段落文字属性时，每个`char`取出的属性组合
+    CHAR_STATS_KEY = itemgetter('size', 'height', 'non_stroking_color', 'fontname')
+
     # 构造函数
     def __init__(self):
         pass
 
-    def parser_pdf(self, pdf_file_path: str, pages: int = None) -> Book:
+    # workers：解析使用的进程数量，大于`1`时，将页码范围分给多个进程并行解析
+    def parser_pdf(self, pdf_file_path: str, pages: int = None, workers: int = 1) -> Book:
         # 初始化 book
         book = Book(pdf_file_path)
 
-        with pdfplumber.open(pdf_file_path) as pdf:
+        for page in self.iter_pages(pdf_file_path, pages, workers):
+            book.add_page(page)
 
-            # 如果想要翻译的页码，大于`PDF`总页数，就报错
-            if pages is not None and pages > len(pdf.pages):
-                raise PageOutOfRangeException(len(book.pages), pages)
+        return book
 
-            if pages is None:
-                pages_to_parse = pdf.pages
-            else:
-                pages_to_parse = pdf.pages[:pages]
+    # 逐页解析`PDF`文件，每解析完一页就返回一页
+    def iter_pages(self, pdf_file_path: str, pages: int = None, workers: int = 1) -> Iterator[Page]:
+        if workers > 1:
+            yield from self._iter_pages_parallel(pdf_file_path, pages, workers)
+            return
+
+        with pdfplumber.open(pdf_file_path) as pdf:
+
+            pages_to_parse = pdf.pages[:self._get_page_count(len(pdf.pages), pages)]
 
             for pdf_page in pages_to_parse:
-                book.add_page(self._new_parser_pdf_page(pdf_page=pdf_page))
+                yield self._new_parser_pdf_page(pdf_page=pdf_page)
 
-        return book
+                # 释放`pdfplumber`缓存的页面对象，保持内存占用和页数无关
+                pdf_page.close()
+
+    # 多进程解析：将页码范围切分成多段，交给进程池解析，再按照页码顺序返回
+    def _iter_pages_parallel(self, pdf_file_path: str, pages: int, workers: int) -> Iterator[Page]:
+        with pdfplumber.open(pdf_file_path) as pdf:
+            page_count = self._get_page_count(len(pdf.pages), pages)
+
+        # 每个进程分到多段，避免某一段的页面特别复杂时，其他进程空等
+        chunk_size = max(1, math.ceil(page_count / (workers * self.CHUNKS_PER_WORKER)))
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_parse_page_range, pdf_file_path, start, min(start + chunk_size, page_count))
+                for start in range(0, page_count, chunk_size)
+            ]
+            try:
+                for future in futures:
+                    yield from future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    # 获取需要解析的页数，如果想要翻译的页码，大于`PDF`总页数，就报错
+    def _get_page_count(self, total: int, pages: int = None) -> int:
+        if pages is None:
+            return total
+        if pages > total:
+            raise PageOutOfRangeException(total, pages)
+        return pages
+
+    # 将`Page`中的图片信息转换成可以序列化的格式，图片数据读取成`bytes`，不再引用`pdfplumber`的文档对象
+    def _compact_page(self, page: Page):
+        for content in page.contents:
+            if content.content_type == ContentType.IMAGE:
+                image = {
+                    key: value for key, value in content.original.items()
+                    if isinstance(value, (int, float, str, bool, tuple))
+                }
+                image["data"] = content.original["stream"].get_data()
+                content.original = image
+                content.translation = image
 
     # 解析`pdfplumber.pdf.Page`，返回`Page`
     def _new_parser_pdf_page(self, pdf_page: pdfplumber.pdf.Page) -> Page:
@@ -45,20 +103,13 @@ class PDFParser:
         # 从单页的`PDF`中，取出每一行的文本数据，返回格式为`List[Dict[str, Any]]`
         lines = pdf_page.extract_text_lines()
 
-        # 从单页的`PDF`中，取出表格数据，返回格式为`List[List[List[Optional[str]]]]`
-        tables = pdf_page.extract_tables()
+        # 从单页的`PDF`中，找出所有的表格，返回格式为`List[Tuple[bbox, List[List[str]], List[List[bbox]]]]`，按照顶部的位置排序
+        tables = self._get_tables(pdf_page)
 
         # 图片信息
         images = pdf_page.images
 
-        # `Table`的每一行的文本信息
-        table_row_texts = []
-        for table in tables:
-            for row in table:
-                table_row_texts.append(" ".join(row))
-
-        page_left = self._get_all_left(pdf_page, lines)
-        page_right = self._get_all_right(pdf_page, lines)
+        page_left, page_right = self._get_page_bounds(pdf_page, lines)
 
         page.left_margin = page_left
         page.right_margin = page_left
@@ -70,42 +121,68 @@ class PDFParser:
 
         temp_lines: List[Dict[str, Any]] = []
 
+        # 下一个可能包含当前行的表格，`lines`和`tables`都是按照从上到下的顺序排列的，所以只需要向后移动
+        table_idx = 0
+
+        # 已经添加到`contents`中的表格
+        added_tables = set()
+
         for idx, line in enumerate(lines):
 
             if idx == 0: print(line)
 
-            text: str = line['text'].strip()
+            # 跳过已经在当前行上方结束的表格
+            line_center = (line['top'] + line['bottom']) / 2
+            while table_idx < len(tables) and tables[table_idx][0][3] < line_center:
+                table_idx += 1
 
-            if not text in table_row_texts:
-                temp_lines.append(line)
+            # 表格区域内的行属于表格，不属于段落：结束当前的段落，并在表格的第一行添加表格
+            line_table_idx = self._find_line_table(line, tables, table_idx, line_center)
+            if line_table_idx is not None:
+                para_lines.append(temp_lines)
+                temp_lines = []
+                if line_table_idx not in added_tables:
+                    added_tables.add(line_table_idx)
+                    contents.append(self._new_table_content(
+                        rows=tables[line_table_idx][1],
+                        top_y=line['chars'][0]['y0'],
+                        width=page_right - page_left,
+                        bbox=tables[line_table_idx][0],
+                        cell_bboxes=tables[line_table_idx][2],
+                    ))
+                continue
+
+            temp_lines.append(line)
 
             if self._is_para_tail(page=pdf_page, line=line, idx=idx, total=len(lines)):
                 para_lines.append(temp_lines)
                 temp_lines = []
 
-            for table in tables:
-                if text == " ".join(table[0]):
-                    para_lines.append(temp_lines)
-                    temp_lines = []
-                    table_content = TableContent([table])
-                    table_content.top_y = line['chars'][0]['y0']
-                    table_content.col_widths = self._get_col_widths(width=page_right - page_left, count=len(table[0]))
-                    contents.append(table_content)
-                    tables = tables[1:]
-                    break
+        # 没有和任何行对应上的表格，使用表格区域的顶部作为位置
+        for table_idx, (bbox, rows, cell_bboxes) in enumerate(tables):
+            if table_idx not in added_tables:
+                contents.append(self._new_table_content(
+                    rows=rows,
+                    top_y=pdf_page.height - bbox[1],
+                    width=page_right - page_left,
+                    bbox=bbox,
+                    cell_bboxes=cell_bboxes,
+                ))
 
         if len(temp_lines) > 0: para_lines.append(temp_lines)
 
         for lines in para_lines:
             if lines:
                 all_text = " ".join([line['text'].strip() for line in lines])
+                font_size, font_height, text_color, is_bold = self._get_para_char_stats(lines)
                 text_content = Content(content_type=ContentType.TEXT, original=all_text)
-                text_content.font_size = self._get_para_font_size(lines)
-                text_content.is_bold = self._get_para_is_bold(lines)
-                text_content.leading = self._get_para_font_height(lines) * 1.2
+                text_content.font_size = font_size
+                text_content.is_bold = is_bold
+                text_content.leading = font_height * 1.2
                 text_content.first_line_offset = self._get_line_first_offset(lines, page_left)
-                text_content.text_color = self._get_para_text_color(lines)
+                text_content.text_color = text_color
                 text_content.top_y = lines[0]['chars'][0]['y0']
+                text_content.bbox = self._get_para_bbox(lines)
                 contents.append(text_content)
 
         for image in images:
@@ -119,6 +196,42 @@ class PDFParser:
 
         return page
 
+    # 获取页面中的表格、对应的区域和每个单元格的区域，空的单元格用空字符串代替，没有数据的表格会被忽略
+    def _get_tables(self, pdf_page: pdfplumber.pdf.Page) -> [(tuple, [[str]], [[tuple]])]:
+        tables = []
+        for table in pdf_page.find_tables():
+            rows = [["" if cell is None else cell for cell in row] for row in table.extract()]
+            if rows and rows[0]:
+                tables.append((table.bbox, rows, [list(row.cells) for row in table.rows]))
+        tables.sort(key=lambda item: item[0][1])
+        return tables
+
+    # 判断一行是否在表格的区域内：行的垂直中心在表格的上下边界之间，并且和表格在水平方向上有重叠
+    # 找出包含当前行的表格，返回表格的下标，没有时返回`None`
+    # 并排或者上下重叠的表格可能同时覆盖当前行的高度，所以从`start`开始检查所有顶部在当前行中线之上的表格
+    def _find_line_table(self, line: any, tables: list, start: int, line_center: float) -> int:
+        for table_idx in range(start, len(tables)):
+            bbox = tables[table_idx][0]
+            if bbox[1] > line_center:
+                break
+            if self._is_line_in_table(line, bbox, line_center):
+                return table_idx
+        return None
+
+    def _is_line_in_table(self, line: any, bbox: tuple, line_center: float) -> bool:
+        x0, top, x1, bottom = bbox
+        return top <= line_center <= bottom and line['x0'] < x1 and line['x1'] > x0
+
+    # 根据表格的数据，创建`TableContent`
+    def _new_table_content(self, rows: [[str]], top_y: float, width: float, bbox: tuple = None,
+                           cell_bboxes: [[tuple]] = None) -> TableContent:
+        table_content = TableContent([rows])
+        table_content.top_y = top_y
+        table_content.bbox = bbox
+        table_content.cell_bboxes = cell_bboxes
+        table_content.col_widths = self._get_col_widths(width=width, count=len(rows[0]))
+        return table_content
+
     # 判读PDF的一行是否是段尾
     def _is_para_tail(self, page: pdfplumber.pdf.Page, line: any, idx: int, total: int) -> bool:
         if line['x1'] / page.width < 0.8: return True
@@ -126,28 +239,19 @@ class PDFParser:
         if idx == total - 1: return True
         return False
 
-    def _get_all_left(self, page: pdfplumber.pdf.Page, lines: any):
+    # 获取页面的左右边界：左边界取各行起始位置的众数，右边界取各行结束位置的最大值，只遍历一次`lines`
+    def _get_page_bounds(self, page: pdfplumber.pdf.Page, lines: any) -> (float, float):
         lefts = []
-        for line in lines:
-            if line['chars']:
-                lefts.append(line['chars'][0]['x0'])
-        if lefts:
-            element_counts = Counter(lefts)
-            most_common_element = element_counts.most_common(1)[0]
-            most_common_value = most_common_element[0]
-            return most_common_value
-        else:
-            return 20
-
-    def _get_all_right(self, page: pdfplumber.pdf.Page, lines: any):
         rights = []
         for line in lines:
-            if line['chars']:
-                rights.append(line['chars'][len(line['chars']) - 1]['x1'])
-        if rights:
-            return max(rights)
+            chars = line['chars']
+            if chars:
+                lefts.append(chars[0]['x0'])
+                rights.append(chars[-1]['x1'])
+        if lefts:
+            return Counter(lefts).most_common(1)[0][0], max(rights)
         else:
-            return page.width - 20
+            return 20, page.width - 20
 
     # 获取段落的首行缩进
     def _get_line_first_offset(self, lines: any, all_left: any):
@@ -156,68 +260,53 @@ class PDFParser:
                 return max(0, lines[0]['chars'][0]['x0'] - all_left)
         return 0
 
+    # 获取段落的区域：所有行的外接矩形
+    def _get_para_bbox(self, lines: any) -> tuple:
+        return (
+            min(line['x0'] for line in lines),
+            min(line['top'] for line in lines),
+            max(line['x1'] for line in lines),
+            max(line['bottom'] for line in lines),
+        )
+
     def _get_para_top(self, lines: any):
         if lines:
             if lines[0]['chars']:
                 return lines[0]['chars'][0]['y0']
         return 0
 
-    def _get_para_font_size(self, lines: any):
-        values = []
-        for line in lines:
-            if line['chars']:
-                for char_info in line['chars']:
-                    values.append(char_info['size'])
-        if values:
-            element_counts = Counter(values)
-            most_common_element = element_counts.most_common(1)[0]
-            most_common_value = most_common_element[0]
-            return most_common_value
-        else:
-            return 24
+    # 获取段落的文字属性，返回`(font_size, font_height, text_color, is_bold)`，每个属性都取段落中出现次数最多的值
+    # 只遍历一次所有的`char`：按`(size, height, color, fontname)`组合计数，再把组合的次数累加到各个属性上
+    # 一个段落中不同的组合通常只有几种，累加的开销可以忽略
+    def _get_para_char_stats(self, lines: any) -> (float, float, any, bool):
+        combos = Counter(map(self.CHAR_STATS_KEY, chain.from_iterable(map(itemgetter('chars'), lines))))
+        if not combos:
+            return 24, 24, (0, 0, 0), False
 
-    def _get_para_font_height(self, lines: any):
-        values = []
-        for line in lines:
-            if line['chars']:
-                for char_info in line['chars']:
-                    values.append(char_info['height'])
-        if values:
-            element_counts = Counter(values)
-            most_common_element = element_counts.most_common(1)[0]
-            most_common_value = most_common_element[0]
-            return most_common_value
-        else:
-            return 24
+        font_size, font_height, text_color, fontname = (self._most_common(combos, idx) for idx in range(4))
 
-    def _get_para_text_color(self, lines: any):
-        values = []
-        for line in lines:
-            if line['chars']:
-                for char_info in line['chars']:
-                    values.append(char_info['non_stroking_color'])
-        if values:
-            element_counts = Counter(values)
-            most_common_element = element_counts.most_common(1)[0]
-            most_common_value = most_common_element[0]
-            return most_common_value
-        else:
-            return (0, 0, 0)
+        return font_size, font_height, text_color, 'bold' in fontname.lower()
 
-    def _get_para_is_bold(self, lines: any):
-        values = []
-        for line in lines:
-            if line['chars']:
-                for char_info in line['chars']:
-                    values.append(char_info['fontname'])
-        if values:
-            element_counts = Counter(values)
-            most_common_element = element_counts.most_common(1)[0]
-            most_common_value = most_common_element[0]
-            return 'bold' in most_common_value.lower()
-        else:
-            return False
+    # 第`idx`个属性出现次数最多的值，次数相同时取最先出现的值
+    def _most_common(self, combos: Counter, idx: int) -> any:
+        counts = {}
+        for combo, count in combos.items():
+            counts[combo[idx]] = counts.get(combo[idx], 0) + count
+        return max(counts, key=counts.__getitem__)
 
     def _get_col_widths(self, width: float, count: int) -> [float]:
         item_width = width / count
         return [item_width] * count
+
+
+# 在子进程中解析`[start, end)`范围内的页面，每个子进程打开自己的`pdfplumber`句柄
+def _parse_page_range(pdf_file_path: str, start: int, end: int) -> [Page]:
+    parser = PDFParser()
+    pages = []
+    with pdfplumber.open(pdf_file_path) as pdf:
+        for pdf_page in pdf.pages[start:end]:
+            page = parser._new_parser_pdf_page(pdf_page=pdf_page)
+            parser._compact_page(page)
+            pages.append(page)
+            pdf_page.close()
+    return pages
@@ -1,13 +1,31 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
 from .pdf_parser import PDFParser
 
 from ..model import Model
-from ..book import Book, ContentType
-from ..utils import LOG
+from ..book import Book, Page, Content, ContentType, TableContent
+from ..utils import LOG, METRICS, estimate_tokens
 
+from .image_cache import ImageCache
+from .page_pipeline import PagePipeline
+from .request_coalescer import RequestCoalescer
+from .skip_classifier import SkipClassifier
+from .text_segmenter import TextSegmenter
+from .text_batcher import TextBatcher
+from .translation_cache import TranslationCache
+from .translation_journal import TranslationJournal
 from .writer import Writer
 
 
 class PDFTranslator:
+    # 结构化翻译时，每一段在`JSON`中额外占用的`token`数（编号、引号、分隔符）
+    JSON_SEGMENT_OVERHEAD_TOKENS = 4
+
     model: Model
 
     pdf_parser: PDFParser
@@ -16,39 +34,467 @@ class PDFTranslator:
 
     book: Book
 
-    def __init__(self, model: Model):
+    # 翻译缓存，为`None`时不使用缓存
+    cache: TranslationCache
+
+    # 合并同时进行中的相同请求
+    coalescer: RequestCoalescer
+
+    # 判断`Content`是否不需要翻译（数字、网址、代码、已经是目标语言的文本等）
+    skip_classifier: SkipClassifier
+
+    # 按模型的上下文长度切分过长的段落
+    segmenter: TextSegmenter
+
+    # 是否使用流式请求：边生成边接收，卡住的请求可以在`stall_timeout`之后提前结束
+    stream_responses: bool
+
+    # 多个`PDFTranslator`共用的并发上限（`threading.Semaphore`），限制同时进行中的模型请求总数，为`None`时不限制
+    request_limit: threading.Semaphore
+
+    def __init__(self, model: Model, cache: TranslationCache = None, stream_responses: bool = False,
+                 request_limit: threading.Semaphore = None, image_cache: ImageCache = None):
         self.model = model
+        self.cache = cache
+        self.stream_responses = stream_responses
+        self.request_limit = request_limit
+        self.coalescer = RequestCoalescer()
+        self.skip_classifier = SkipClassifier()
+        self.segmenter = TextSegmenter(model.get_max_segment_tokens())
         self.pdf_parser = PDFParser()
-        self.writer = Writer()
+        self.writer = Writer(image_cache)
 
+    # max_workers：同时进行中的翻译请求数量，默认为`1`，即逐个翻译
+    # batch_chars：将连续的`TEXT`合并到一个请求中翻译时，每个请求的原文字符数上限，默认为`0`，即不合并
+    # resume：是否从上一次中断的断点记录中恢复，已经翻译过的`Content`不再重新翻译
+    # streaming：是否逐页流水线处理，解析、翻译、写入同时进行，内存占用和页数无关
+    # parse_workers：解析`PDF`使用的进程数量，默认为`1`，即在当前进程中逐页解析
+    # structured：合并翻译时使用`JSON`格式的请求和结果，校验每一段译文，只重新请求缺失或无效的段落
+    # render_workers：渲染`PDF`使用的进程数量，默认为`1`，即在当前进程中渲染
     def translate_pdf(self,
                       pdf_file_path: str,
                       file_format: str = 'markdown',
                       target_language: str = '中文',
                       output_file_path: str = None,
-                      pages: int = None):
+                      pages: int = None,
+                      max_workers: int = 1,
+                      batch_chars: int = 0,
+                      resume: bool = False,
+                      streaming: bool = False,
+                      parse_workers: int = 1,
+                      structured: bool = False,
+                      render_workers: int = 1):
 
-        # 解析`PDF`文件，生成`book`对象
-        self.book = self.pdf_parser.parser_pdf(pdf_file_path, pages)
+        # 断点记录保存在输出文件的旁边
+        output_file_path = self.writer.get_output_file_path(pdf_file_path, output_file_path, file_format)
+        journal = TranslationJournal(TranslationJournal.journal_path_for(output_file_path))
+        journal_header = {
+            "pdf_file_path": pdf_file_path,
+            "target_language": target_language,
+            "model": self.model.get_model_name(),
+        }
 
-        for page_idx, page in enumerate(self.book.pages):
-            for content_idx, content in enumerate(page.contents):
+        records = journal.load(journal_header) if resume else {}
 
-                # 如果是图片，就跳过
-                if content.content_type == ContentType.IMAGE: continue
+        journal.open(journal_header, resume)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+
+        try:
+            if streaming:
+                # 流水线模式下各阶段同时进行，解析和翻译按页统计耗时
+                self._translate_pdf_streaming(pdf_file_path, output_file_path, file_format, target_language, pages,
+                                              parse_workers, executor, batch_chars, journal, records, structured,
+                                              render_workers)
+            else:
+                # 解析`PDF`文件，生成`book`对象
+                with METRICS.timer("stage_seconds", stage="parse"):
+                    self.book = self.pdf_parser.parser_pdf(pdf_file_path, pages, parse_workers)
+                METRICS.inc("pages_total", len(self.book.pages))
+
+                for page_idx, page in enumerate(self.book.pages):
+                    self._restore_from_journal(page_idx, page, records)
+
+                # 翻译`book`中的所有`Content`
+                with METRICS.timer("stage_seconds", stage="translate"):
+                    self._translate_pages(list(enumerate(self.book.pages)), target_language, executor, batch_chars,
+                                          journal, structured)
+
+                with METRICS.timer("stage_seconds", stage="write"):
+                    self.writer.save_translated_book(self.book, output_file_path, file_format, render_workers)
+        finally:
+            journal.close()
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        if self.cache:
+            LOG.info(f"翻译缓存：{self.cache.stats()}")
+        skip_stats = self.skip_classifier.stats()
+        if skip_stats["skipped"]:
+            LOG.info(f"有 {skip_stats['skipped']} 个内容不需要翻译，节省了约 {skip_stats['saved_tokens']} 个`token`")
+        if self.coalescer.get_coalesced_count():
+            LOG.info(f"合并了 {self.coalescer.get_coalesced_count()} 个进行中的相同请求")
 
-                # 获取`prompt`
+        # 翻译结果已经保存，不再需要断点记录
+        journal.remove()
+
+    # 翻译已经解析好的`book`，不写入文件，也不记录断点
+    def translate_book(self, book: Book, target_language: str = '中文', max_workers: int = 1, batch_chars: int = 0,
+                       structured: bool = False):
+        self.book = book
+        executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+        try:
+            self._translate_pages(list(enumerate(book.pages)), target_language, executor, batch_chars, None,
+                                  structured)
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    # 流水线处理：解析线程、翻译线程和当前线程（写入）通过有界队列连接，每一页翻译完成后立即写入
+    def _translate_pdf_streaming(self, pdf_file_path: str, output_file_path: str, file_format: str,
+                                 target_language: str, pages: int, parse_workers: int, executor: ThreadPoolExecutor,
+                                 batch_chars: int, journal: TranslationJournal, records: dict, structured: bool,
+                                 render_workers: int = 1):
+
+        # 流水线模式下，`book`只保存源文件的信息，不保存`Page`
+        self.book = Book(pdf_file_path)
+
+        def parse_stage():
+            started_at = time.perf_counter()
+            for page_idx, page in enumerate(self.pdf_parser.iter_pages(pdf_file_path, pages, parse_workers)):
+                self._restore_from_journal(page_idx, page, records)
+                # 只统计解析这一页的耗时，不包括等待下游取走结果的时间
+                METRICS.observe("page_stage_seconds", time.perf_counter() - started_at, stage="parse")
+                METRICS.inc("pages_total")
+                yield page_idx, page
+                started_at = time.perf_counter()
+
+        def translate_stage(parsed_pages):
+            for page_idx, page in parsed_pages:
+                with METRICS.timer("page_stage_seconds", stage="translate"):
+                    self._translate_pages([(page_idx, page)], target_language, executor, batch_chars, journal,
+                                          structured)
+                yield page
+
+        translated_pages = PagePipeline().run(parse_stage, [translate_stage])
+
+        with METRICS.timer("stage_seconds", stage="pipeline"):
+            self.writer.save_translated_pages(self.book, translated_pages, output_file_path, file_format,
+                                              render_workers)
+
+    # 将断点记录中的翻译结果，恢复到`page`中
+    def _restore_from_journal(self, page_idx: int, page: Page, records: dict):
+        restored = 0
+        for content_idx, content in enumerate(page.contents):
+            if content.content_type == ContentType.IMAGE: continue
+            record = records.get((page_idx, content_idx))
+            if record is None: continue
+            digest, translation = record
+            if TranslationJournal.source_digest(content) != digest: continue
+            # `TABLE`的翻译结果以行数组的形式记录
+            if isinstance(translation, list):
+                translation = pd.DataFrame(translation)
+            content.set_translation(translation, True)
+            restored += 1
+        if restored:
+            LOG.info(f"从断点记录中恢复了第 {page_idx + 1} 页的 {restored} 个已翻译的内容")
+
+    # 翻译多个`Page`中的所有`Content`
+    # pages：`(page_idx, page)`数组
+    # executor：并发翻译使用的线程池，为`None`时逐个翻译
+    # journal：断点记录，为`None`时不记录
+    def _translate_pages(self, pages: [(int, Page)], target_language: str, executor: ThreadPoolExecutor,
+                         batch_chars: int, journal: TranslationJournal, structured: bool = False):
+
+        # 收集所有需要翻译的`Content`，图片和已经翻译过的`Content`不需要翻译
+        # 原文相同的`Content`（页眉、页脚、表头等）只翻译第一个，其余的复用它的结果
+        tasks = []
+        duplicates = {}
+        for page_idx, page in pages:
+            for content_idx, content in enumerate(page.contents):
+                if content.content_type == ContentType.IMAGE: continue
+                if content.status: continue
+                if self.skip_classifier.should_skip(content, target_language):
+                    METRICS.inc("segments_skipped_total")
+                    # 原文直接作为译文
+                    original = pd.DataFrame(content.get_rows()) if content.content_type == ContentType.TABLE \
+                        else content.original
+                    content.set_translation(original, True)
+                    continue
+                task = (page_idx, content_idx, content)
                 prompt = self.model.get_translate_prompt(content, target_language)
+                if prompt in duplicates:
+                    duplicates[prompt].append(task)
+                else:
+                    duplicates[prompt] = []
+                    tasks.append(task)
+
+        # 只保留有重复的`Content`，`{首个 Content 的 prompt: [重复的任务]}`
+        duplicates = {prompt: same_tasks for prompt, same_tasks in duplicates.items() if same_tasks}
+        if duplicates:
+            METRICS.inc("segments_deduplicated_total", sum(len(same_tasks) for same_tasks in duplicates.values()))
+            LOG.info(f"有 {sum(len(same_tasks) for same_tasks in duplicates.values())} 个重复的内容，直接复用翻译结果")
+
+        # 将任务分成批次，每个批次对应一次请求
+        if batch_chars > 0:
+            batches = TextBatcher(max_chars=batch_chars, max_tokens=self.segmenter.max_tokens).make_batches(tasks)
+        else:
+            batches = [[task] for task in tasks]
+
+        # 逐个翻译
+        if executor is None:
+            for batch in batches:
+                results = self._translate_batch(batch, target_language, journal, structured)
+                self._set_batch_translation(batch, results, target_language, duplicates, journal)
+            return
+
+        # 并发翻译：请求的完成顺序是不确定的，所以按照提交的顺序取结果，并写回对应的位置
+        futures = [executor.submit(self._translate_batch, batch, target_language, journal, structured)
+                   for batch in batches]
+        try:
+            for batch, future in zip(batches, futures):
+                self._set_batch_translation(batch, future.result(), target_language, duplicates, journal)
+        except Exception:
+            # 有一个请求失败了，就取消还没有开始的请求
+            for future in futures:
+                future.cancel()
+            raise
+
+    # 将一个批次的翻译结果写回对应的`Content`，以及和它原文相同的`Content`
+    # duplicates：`{prompt: [重复的任务]}`，重复的任务翻译成功时也写入断点记录
+    def _set_batch_translation(self, batch: [tuple], results: [(str, bool)], target_language: str,
+                               duplicates: dict, journal: TranslationJournal):
+        for (page_idx, content_idx, content), (translation, status) in zip(batch, results):
+            content.set_translation(translation, status)
+            if not duplicates: continue
+            prompt = self.model.get_translate_prompt(content, target_language)
+            for same_page_idx, same_content_idx, same_content in duplicates.get(prompt, []):
+                same_content.set_translation(translation, status)
+                if journal and status:
+                    journal.record(same_page_idx, same_content_idx, same_content, translation)
+
+    # 翻译一个批次，返回和`batch`一一对应的`(translation, status)`数组，翻译成功的结果会写入断点记录
+    # structured：合并翻译时是否使用`JSON`格式的请求和结果
+    def _translate_batch(self, batch: [tuple], target_language: str, journal: TranslationJournal,
+                         structured: bool = False) -> [(str, bool)]:
+        contents = [content for page_idx, content_idx, content in batch]
 
-                # 打印`prompt`
-                LOG.debug(prompt)
+        # 先查询缓存，只翻译没有命中的`Content`
+        results = [self._get_cached_translation(content, target_language) for content in contents]
+        pending = [idx for idx, result in enumerate(results) if result is None]
 
-                # 和大模型交互，获取结果
+        if len(pending) == 1:
+            results[pending[0]] = self._translate_content(contents[pending[0]], target_language)
+
+        elif pending and structured:
+            # 结构化合并翻译，缺失或无效的段落只重新请求这些段落，仍然失败的再单独翻译
+            texts = [contents[idx].original for idx in pending]
+            segments = self._translate_json_segments(texts, target_language)
+            for number, idx in enumerate(pending):
+                if number in segments:
+                    results[idx] = (segments[number], True)
+                    self._set_cached_translation(contents[idx], target_language, segments[number])
+                else:
+                    results[idx] = self._translate_content(contents[idx], target_language)
+
+        elif pending:
+            # 合并翻译
+            texts = [contents[idx].original for idx in pending]
+            prompt = self.model.get_batch_text_prompt(texts, target_language)
+
+            LOG.debug(prompt)
+
+            translation, status = self.coalescer.request(prompt, self._make_request)
+
+            LOG.debug(translation)
+
+            segments = self.model.split_batch_translation(translation, len(pending)) if status else {}
+            if status and not segments:
+                LOG.warning(f"合并翻译的结果中段落编号缺失、重复或顺序错误，{len(pending)} 段全部单独重新翻译")
+
+            # 拆分失败的段落，单独重新翻译
+            for number, idx in enumerate(pending, start=1):
+                if number in segments:
+                    results[idx] = (segments[number], True)
+                    self._set_cached_translation(contents[idx], target_language, segments[number])
+                else:
+                    if segments:
+                        LOG.warning(f"合并翻译的结果中第 {number} 段为空，单独重新翻译")
+                    results[idx] = self._translate_content(contents[idx], target_language)
+
+        if journal:
+            for (page_idx, content_idx, content), (translation, status) in zip(batch, results):
+                if status:
+                    journal.record(page_idx, content_idx, content, translation)
+
+        return results
+
+    # 翻译单个`Content`，返回`(translation, status)`
+    def _translate_content(self, content: Content, target_language: str) -> (str, bool):
+        if content.content_type == ContentType.TABLE:
+            return self._translate_table(content, target_language)
+
+        # 超过模型上下文长度的段落，按句子切分后逐段翻译，再拼接起来
+        if self.segmenter.is_oversized(content.original):
+            return self._translate_oversized_text(content, target_language)
+
+        # 获取`prompt`
+        prompt = self.model.get_translate_prompt(content, target_language)
+
+        # 打印`prompt`
+        LOG.debug(prompt)
+
+        # 和大模型交互，获取结果，相同的`prompt`正在请求时直接共用它的结果
+        translation, status = self.coalescer.request(prompt, self._make_request)
+
+        # 打印和大模型交互的结果
+        LOG.debug(translation)
+
+        if status:
+            self._set_cached_translation(content, target_language, translation)
+
+        return translation, status
+
+    # 切分过长的`TEXT`，逐段翻译后拼接，返回`(translation, status)`，有一段失败时整体视为失败
+    def _translate_oversized_text(self, content: Content, target_language: str) -> (str, bool):
+        pieces = self.segmenter.split(content.original)
+        LOG.info(f"段落过长（约 {estimate_tokens(content.original)} 个`token`），切分成 {len(pieces)} 段翻译")
+
+        translations = []
+        for piece in pieces:
+            translation, status = self._translate_content(Content(ContentType.TEXT, piece), target_language)
+            if not status:
+                return translation, False
+            translations.append(translation)
+
+        translation = self.segmenter.join(translations, target_language)
+        self._set_cached_translation(content, target_language, translation)
+        return translation, True
+
+    # 翻译`TABLE`：去重后的单元格以`JSON`的形式在一个请求中翻译，再按`(row, col)`写回，返回`(DataFrame, status)`
+    # 不需要模型按原样返回整张表格，也就不会因为拆分表格失败而丢掉翻译结果
+    def _translate_table(self, content: TableContent, target_language: str) -> (pd.DataFrame, bool):
+        rows = [["" if cell is None else str(cell).strip() for cell in row] for row in content.get_rows()]
+
+        # 需要翻译的单元格：去重，并跳过数字等不需要翻译的单元格
+        cells = list(dict.fromkeys(cell for row in rows for cell in row
+                                   if not self.skip_classifier.is_untranslatable(cell, target_language)))
+
+        # 单元格的缓存和相同原文的`TEXT`共用
+        translations = {}
+        for cell in cells:
+            cached = self.cache.get(self.model.get_model_name(), self.model.get_text_prompt(cell, target_language)) \
+                if self.cache else None
+            if cached is not None:
+                translations[cell] = cached
+
+        pending = [cell for cell in cells if cell not in translations]
+
+        # 按模型的上下文长度分批请求，过长的单元格单独切分后翻译
+        for batch in self._split_json_batches(pending):
+            if len(batch) == 1 and self.segmenter.is_oversized(batch[0]):
+                translation, status = self._translate_oversized_text(Content(ContentType.TEXT, batch[0]),
+                                                                     target_language)
+                results = {0: translation} if status else {}
+            else:
+                results = self._translate_json_segments(batch, target_language)
+            for idx, cell in enumerate(batch):
+                if idx not in results: continue
+                translations[cell] = results[idx]
+                if self.cache:
+                    self.cache.put(self.model.get_model_name(), self.model.get_text_prompt(cell, target_language),
+                                   results[idx])
+        pending = [cell for cell in pending if cell not in translations]
+
+        if pending:
+            LOG.warning(f"表格中有 {len(pending)} 个单元格翻译失败，保留原文")
+
+        translated = pd.DataFrame([[translations.get(cell, cell) for cell in row] for row in rows])
+
+        # 一个单元格都没有翻译成功时，视为翻译失败，不写入断点记录
+        return translated, not cells or len(pending) < len(cells)
+
+    # 将结构化翻译的文本分成多批，每一批的原文不超过`segmenter.max_tokens`，超过上限的文本单独成为一批
+    def _split_json_batches(self, texts: [str]) -> [[str]]:
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text) + self.JSON_SEGMENT_OVERHEAD_TOKENS
+            if batch and batch_tokens + tokens > self.segmenter.max_tokens:
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    # 发送请求，返回`(translation, status)`，并记录请求的耗时、`token`数和结果
+    def _make_request(self, prompt: str) -> (str, bool):
+        if self.request_limit is None:
+            return self._send_request(prompt)
+        # 等待并发名额的时间不计入请求耗时
+        with self.request_limit:
+            return self._send_request(prompt)
+
+    def _send_request(self, prompt: str) -> (str, bool):
+        backend = self.model.get_model_name()
+        METRICS.inc("model_prompt_tokens_total", estimate_tokens(prompt), backend=backend)
+        started_at = time.perf_counter()
+        try:
+            if self.stream_responses:
+                translation, status = self.model.make_streaming_request(prompt)
+            else:
                 translation, status = self.model.make_request(prompt)
+        except Exception:
+            METRICS.inc("model_requests_total", backend=backend, status="error")
+            raise
+        finally:
+            METRICS.observe("model_request_seconds", time.perf_counter() - started_at, backend=backend)
+        METRICS.inc("model_requests_total", backend=backend, status="ok" if status else "failed")
+        METRICS.inc("model_completion_tokens_total", estimate_tokens(translation), backend=backend)
+        return translation, status
+
+    # 以`JSON`的形式翻译多段文本，返回`{下标: 译文}`
+    # 缺失或无效的段落再请求`retries`次，每次只请求这些段落，仍然失败的不在结果中
+    def _translate_json_segments(self, texts: [str], target_language: str, retries: int = 1) -> dict:
+        translations = {}
+        pending = list(range(len(texts)))
+        for attempt in range(retries + 1):
+            if not pending: break
+            if attempt:
+                LOG.warning(f"结构化翻译的结果中有 {len(pending)} 段缺失或无效，重新请求这些段落")
+
+            pending_texts = [texts[idx] for idx in pending]
+            prompt = self.model.get_json_batch_prompt(pending_texts, target_language)
+
+            LOG.debug(prompt)
+
+            translation, status = self.coalescer.request(prompt, self._make_request)
+
+            LOG.debug(translation)
 
-                # 打印和大模型交互的结果
-                LOG.info(translation)
+            segments = self.model.split_json_translation(translation, pending_texts) if status else {}
+            for number, idx in enumerate(pending, start=1):
+                if number in segments:
+                    translations[idx] = segments[number]
+            pending = [idx for idx in pending if idx not in translations]
+        return translations
 
-                self.book.pages[page_idx].contents[content_idx].set_translation(translation, status)
+    # 查询`Content`的翻译缓存，未命中时返回`None`
+    # 缓存以单个`Content`的`prompt`为准，所以合并翻译和单独翻译的结果可以共用
+    # `TABLE`按单元格缓存（见`_translate_table`），这里不查询
+    def _get_cached_translation(self, content: Content, target_language: str) -> (str, bool):
+        if not self.cache: return None
+        if content.content_type == ContentType.TABLE: return None
+        prompt = self.model.get_translate_prompt(content, target_language)
+        translation = self.cache.get(self.model.get_model_name(), prompt)
+        if translation is None: return None
+        return translation, True
 
-        self.writer.save_translated_book(self.book, output_file_path, file_format)
\ No newline at end of file
+    def _set_cached_translation(self, content: Content, target_language: str, translation: str):
+        if not self.cache: return
+        prompt = self.model.get_translate_prompt(content, target_language)
+        self.cache.put(self.model.get_model_name(), prompt, translation)
@@ -0,0 +1,43 @@
+import threading
+
+from concurrent.futures import Future
+
+from ..utils import METRICS
+
+
+# 合并进行中的相同请求：同一个`prompt`同时只发送一次，其他调用者等待并共用这一次的结果
+# 请求结束后立即移除，之后相同的`prompt`会重新发送（已完成的结果由翻译缓存负责复用）
+class RequestCoalescer:
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        # 被合并掉的请求数
+        self._coalesced = 0
+
+    # 发送请求，`send`接收`prompt`并返回结果，相同的`prompt`正在请求时直接等待它的结果
+    def request(self, prompt: str, send):
+        with self._lock:
+            future = self._in_flight.get(prompt)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[prompt] = future
+            else:
+                self._coalesced += 1
+                METRICS.inc("requests_coalesced_total")
+        if not is_owner:
+            return future.result()
+
+        try:
+            future.set_result(send(prompt))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(prompt, None)
+        return future.result()
+
+    # 被合并掉的请求数
+    def get_coalesced_count(self) -> int:
+        return self._coalesced
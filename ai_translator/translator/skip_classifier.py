@@ -0,0 +1,156 @@
+import re
+import threading
+import unicodedata
+
+from ..book import Content, ContentType, TableContent
+from ..utils import estimate_tokens
+
+
+# 在本地判断`Content`是否需要翻译：页码、数字、网址、公式、代码和已经是目标语言的文本，原样保留，不发送请求
+class SkipClassifier:
+
+    # 网址和邮箱
+    URL_PATTERN = re.compile(r"^(?:(?:https?|ftp)://|www\.)\S+$|^[\w.+-]+@[\w-]+(?:\.[\w-]+)+$", re.IGNORECASE)
+
+    # 简单的公式：由运算符连接的变量、数字，例如`x = 2y + 1`，按记号逐个检查，不使用回溯匹配
+    # 变量、数字、运算符、空白、括号和数学符号（最后一项匹配其他任何字符，出现时不是公式）
+    FORMULA_TOKEN_PATTERN = re.compile(
+        r"(?P<variable>[A-Za-zα-ωΑ-Ω]+)|(?P<number>\d[\d.,]*)|(?P<operator>[=<>≤≥≈≠±+\-*/^])|"
+        r"(?P<space>\s+)|(?P<bracket>[()\[\]{}|′'!])|(?P<symbol>[√∑∫∞])|(?P<other>.)")
+
+    # 每个变量最多的字母数，超过时是单词
+    FORMULA_MAX_VARIABLE_LETTERS = 2
+
+    # 连字符和斜杠在普通文本中也很常见（`A / B`、`well-known`），只由它们连接变量时不认为是公式
+    FORMULA_WEAK_OPERATORS = "-/"
+
+    # 代码行的开头：关键字之后必须跟着代码的结构，只有关键字时可能是普通的句子（例如`class of students`）
+    CODE_START_PATTERN = re.compile(
+        r"^\s*(?:def \w+\s*\(|class \w+\s*[(:{]|import [\w.]+(?:\s+as\s+\w+)?\s*(?:;|$)|from [\w.]+ import \w|"
+        r"#include\s*[<\"]|#define \w+|(?:if|for|while)\s*\(.*\)\s*[{:])")
+
+    # 代码中常见、但自然语言中很少出现的符号，出现一种时认为是代码
+    CODE_STRONG_TOKENS = ("==", "!=", "=>", "::", "&&", "||")
+
+    # 代码中常见、但自然语言中也会出现的符号，出现三种以上时认为是代码
+    CODE_WEAK_TOKENS = ("{", "}", ";", "()", "[]", "->")
+
+    # 以句子的标点结尾的文本是普通的句子，不是代码
+    SENTENCE_END_PATTERN = re.compile(r"[.!?…。！？][\"'”’)）]*$")
+
+    # 使用汉字、假名、谚文的目标语言，其他目标语言（拉丁字母等）无法只靠文字判断是否已经是目标语言
+    TARGET_SCRIPTS = {
+        "中文": "han", "简体中文": "han", "繁体中文": "han", "Chinese": "han",
+        "日文": "kana", "日语": "kana", "Japanese": "kana",
+        "韩文": "hangul", "韩语": "hangul", "Korean": "hangul",
+    }
+
+    # 已经是目标语言的文本中，其他文字（例如英文缩写）最多占的比例，其他文字按`4`个字母算一个字
+    FOREIGN_RATIO = 0.3
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._skipped = 0
+        self._saved_tokens = 0
+
+    # 判断`content`是否不需要翻译，不需要时返回`True`，并计入节省的请求数和`token`数
+    def should_skip(self, content: Content, target_language: str) -> bool:
+        if content.content_type == ContentType.TEXT:
+            skip = self.is_untranslatable(content.original, target_language)
+        elif content.content_type == ContentType.TABLE:
+            content: TableContent
+            skip = all(self.is_untranslatable("" if cell is None else str(cell), target_language)
+                       for row in content.get_rows() for cell in row)
+        else:
+            return False
+
+        if skip:
+            source = content.original if content.content_type == ContentType.TEXT else content.get_original_as_str()
+            with self._lock:
+                self._skipped += 1
+                # 请求的`token`数包括原文和译文
+                self._saved_tokens += estimate_tokens(source) * 2
+        return skip
+
+    # 判断一段文本（或表格的单元格）是否不需要翻译
+    def is_untranslatable(self, text: str, target_language: str) -> bool:
+        text = text.strip() if text else ""
+        if not text:
+            return True
+        if not any(unicodedata.category(char).startswith("L") for char in text):
+            # 没有任何字母：页码、数字、日期、金额、符号
+            return True
+        if self.URL_PATTERN.match(text) or self._is_formula(text):
+            return True
+        if self._is_code(text):
+            return True
+        return self._is_target_language(text, target_language)
+
+    # 不需要翻译的数量和节省的`token`数
+    def stats(self) -> dict:
+        with self._lock:
+            return {"skipped": self._skipped, "saved_tokens": self._saved_tokens}
+
+    # 公式中的变量必须是单独的记号，两个变量之间至少隔着一个数字、运算符或括号，例如`f(x)`
+    # 至少要有一个数字，或者一个连字符、斜杠以外的运算符或数学符号
+    def _is_formula(self, text: str) -> bool:
+        has_operator = False
+        is_math = False
+        previous = None
+        for match in self.FORMULA_TOKEN_PATTERN.finditer(text):
+            kind = match.lastgroup
+            if kind == "other":
+                return False
+            if kind == "space":
+                continue
+            if kind == "variable":
+                if len(match.group()) > self.FORMULA_MAX_VARIABLE_LETTERS or previous == "variable":
+                    return False
+            elif kind == "operator":
+                has_operator = True
+                is_math = is_math or match.group() not in self.FORMULA_WEAK_OPERATORS
+            elif kind != "bracket":
+                is_math = True
+            previous = kind
+        return has_operator and is_math
+
+    def _is_code(self, text: str) -> bool:
+        if self._count_script(text)["han"] or self.SENTENCE_END_PATTERN.search(text):
+            return False
+        if self.CODE_START_PATTERN.match(text):
+            return True
+        if any(token in text for token in self.CODE_STRONG_TOKENS):
+            return True
+        return sum(1 for token in self.CODE_WEAK_TOKENS if token in text) >= 3
+
+    def _is_target_language(self, text: str, target_language: str) -> bool:
+        script = self.TARGET_SCRIPTS.get(target_language)
+        if script is None:
+            return False
+        counts = self._count_script(text)
+        counts["other"] /= 4
+        letters = sum(counts.values())
+        if script == "han":
+            # 有假名或谚文时是日文或韩文
+            native = counts["han"] if not counts["kana"] and not counts["hangul"] else 0
+        elif script == "kana":
+            native = counts["han"] + counts["kana"] if counts["kana"] else 0
+        else:
+            native = counts["hangul"]
+        return native > 0 and letters - native <= letters * self.FOREIGN_RATIO
+
+    # 统计各种文字的字母数量
+    @staticmethod
+    def _count_script(text: str) -> dict:
+        counts = {"han": 0, "kana": 0, "hangul": 0, "other": 0}
+        for char in text:
+            if "一" <= char <= "鿿" or "㐀" <= char <= "䶿":
+                counts["han"] += 1
+            elif "぀" <= char <= "ヿ":
+                counts["kana"] += 1
+            elif "가" <= char <= "힯":
+                counts["hangul"] += 1
+            elif char.isalpha():
+                counts["other"] += 1
+        return counts
+
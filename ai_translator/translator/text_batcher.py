@@ -0,0 +1,52 @@
+from ..book import ContentType
+from ..utils import estimate_tokens
+
+
+class TextBatcher:
+    # 每个批次中，原文的字符数上限
+    max_chars: int
+
+    # 每个批次中，最多包含的段落数量
+    max_segments: int
+
+    # 每个批次中，原文的`token`数上限，为`None`时不限制
+    max_tokens: int
+
+    # 构造函数
+    def __init__(self, max_chars: int, max_segments: int = 20, max_tokens: int = None):
+        self.max_chars = max_chars
+        self.max_segments = max_segments
+        self.max_tokens = max_tokens
+
+    # 将需要翻译的任务分成多个批次
+    # 连续的`TEXT`会被打包到一个批次中，直到超过字符数、`token`数或段落数的上限；`TABLE`总是单独一个批次
+    # tasks：`(page_idx, content_idx, content)`数组
+    def make_batches(self, tasks: [tuple]) -> [[tuple]]:
+        batches = []
+        current = []
+        current_chars = 0
+        current_tokens = 0
+
+        for task in tasks:
+            content = task[2]
+
+            if content.content_type != ContentType.TEXT:
+                if current: batches.append(current)
+                batches.append([task])
+                current, current_chars, current_tokens = [], 0, 0
+                continue
+
+            chars = len(content.original)
+            tokens = estimate_tokens(content.original) if self.max_tokens else 0
+            if current and (current_chars + chars > self.max_chars or len(current) >= self.max_segments
+                            or self.max_tokens and current_tokens + tokens > self.max_tokens):
+                batches.append(current)
+                current, current_chars, current_tokens = [], 0, 0
+
+            current.append(task)
+            current_chars += chars
+            current_tokens += tokens
+
+        if current: batches.append(current)
+
+        return batches
@@ -0,0 +1,60 @@
+import re
+
+from .skip_classifier import SkipClassifier
+from ..utils import estimate_tokens
+
+
+# 按`token`数切分过长的段落：优先在句子结尾处切分，其次是逗号、分号等，最后是空白，都没有时按长度硬切
+class TextSegmenter:
+
+    # 每一段最多的`token`数
+    max_tokens: int
+
+    # 切分点，按优先级排列，只匹配位置，标点和空白保留在前一段的末尾
+    SPLIT_PATTERNS = (
+        re.compile(r"(?<=[。！？!?])|(?<=[.;:]\s)"),
+        re.compile(r"(?<=[，；、,;])"),
+        re.compile(r"(?<=\s)"),
+    )
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+
+    # 是否需要切分
+    def is_oversized(self, text: str) -> bool:
+        return estimate_tokens(text) > self.max_tokens
+
+    # 将`text`切分成不超过`max_tokens`的多段，相邻的短句会尽量合并到同一段中
+    def split(self, text: str) -> [str]:
+        return [piece.strip() for piece in self._split(text, 0) if piece.strip()]
+
+    # 将多段译文拼接成一段，目标语言是中日韩文字时不加空格
+    def join(self, translations: [str], target_language: str) -> str:
+        separator = "" if target_language in SkipClassifier.TARGET_SCRIPTS else " "
+        return separator.join(translation.strip() for translation in translations)
+
+    def _split(self, text: str, level: int) -> [str]:
+        if not self.is_oversized(text):
+            return [text]
+        if level >= len(self.SPLIT_PATTERNS):
+            return self._split_by_length(text)
+
+        pieces = []
+        current = ""
+        for part in self.SPLIT_PATTERNS[level].split(text):
+            if not part: continue
+            if current and self.is_oversized(current + part):
+                pieces.append(current)
+                current = ""
+            current += part
+        if current: pieces.append(current)
+
+        # 仍然过长的部分，使用下一级的切分点
+        return [piece for item in pieces for piece in self._split(item, level + 1)]
+
+    # 没有任何切分点时，按估算的长度硬切
+    def _split_by_length(self, text: str) -> [str]:
+        tokens = max(1, estimate_tokens(text))
+        size = max(1, len(text) * self.max_tokens // tokens)
+        return [text[start:start + size] for start in range(0, len(text), size)]
+
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from ..utils import LOG, METRICS
+
+
+# 基于`SQLite`的翻译缓存，在请求大模型之前查询，相同的段落在不同页面、不同运行、不同`PDF`之间只需要翻译一次
+# 缓存的`key`由模型名称和`prompt`计算得到，而`prompt`由源文本、目标语言和`prompt`模板共同决定
+# 超过条目数或者总大小的上限时，按照最近访问时间淘汰（LRU）
+class TranslationCache:
+    # 缓存文件的路径
+    cache_path: str
+
+    # 最多缓存的条目数
+    max_entries: int
+
+    # 缓存的译文总大小的上限，单位：字节
+    max_bytes: int
+
+    # 命中次数
+    hits: int
+
+    # 未命中次数
+    misses: int
+
+    # 每写入多少次，检查一次是否需要淘汰
+    EVICT_INTERVAL = 100
+
+    # 构造函数
+    def __init__(self, cache_path: str, max_entries: int = 100000, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        # 如果文件夹的路径不存在，就创建
+        folder = os.path.dirname(cache_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translation (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON translation (last_access)")
+        self._conn.commit()
+
+    @classmethod
+    def make_key(cls, model_name: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+    # 查询缓存，未命中时返回`None`
+    def get(self, model_name: str, prompt: str) -> str:
+        key = self.make_key(model_name, prompt)
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translation WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                METRICS.inc("translation_cache_requests_total", result="miss")
+                return None
+            self.hits += 1
+            METRICS.inc("translation_cache_requests_total", result="hit")
+            self._conn.execute("UPDATE translation SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    # 写入缓存
+    def put(self, model_name: str, prompt: str, translation: str):
+        key = self.make_key(model_name, prompt)
+        size = len(translation.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translation (key, translation, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, translation, size, time.time())
+            )
+            self._puts += 1
+            if self._puts % self.EVICT_INTERVAL == 0:
+                self._evict()
+            self._conn.commit()
+
+    # 按照最近访问时间，淘汰超出上限的缓存
+    def _evict(self):
+        count, total_size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translation").fetchone()
+
+        excess_entries = max(0, count - self.max_entries)
+        excess_bytes = max(0, total_size - self.max_bytes)
+        if excess_entries == 0 and excess_bytes == 0:
+            return
+
+        keys = []
+        freed_bytes = 0
+        for key, size in self._conn.execute("SELECT key, size FROM translation ORDER BY last_access ASC"):
+            if len(keys) >= excess_entries and freed_bytes >= excess_bytes:
+                break
+            keys.append((key,))
+            freed_bytes += size
+
+        self._conn.executemany("DELETE FROM translation WHERE key = ?", keys)
+        LOG.debug(f"翻译缓存淘汰了 {len(keys)} 条记录")
+
+    # 命中率等统计信息
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
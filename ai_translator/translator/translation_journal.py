@@ -0,0 +1,120 @@
+import hashlib
+import os
+import threading
+
+import pandas as pd
+import simplejson
+
+from ..book import Content, ContentType, TableContent
+from ..utils import LOG
+
+
+# 翻译的断点记录，每翻译完一个`Content`，就把结果追加到输出文件旁边的`.journal`文件中（`JSON Lines`格式）
+# 翻译中断后重新运行时，可以从记录中恢复已经翻译过的`Content`，只翻译剩下的部分
+class TranslationJournal:
+    # 记录文件的路径
+    journal_path: str
+
+    # 每写入多少条记录，将数据同步到磁盘一次
+    sync_interval: int
+
+    # 构造函数
+    def __init__(self, journal_path: str, sync_interval: int = 20):
+        self.journal_path = journal_path
+        self.sync_interval = sync_interval
+        self._file = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    # 根据输出文件的路径，获取记录文件的路径
+    @classmethod
+    def journal_path_for(cls, output_file_path: str) -> str:
+        return output_file_path + ".journal"
+
+    # 计算`Content`原文的摘要，用来确认记录和`Content`是对应的
+    @classmethod
+    def source_digest(cls, content: Content) -> str:
+        if content.content_type == ContentType.TABLE:
+            content: TableContent
+            source = content.get_original_as_str()
+        else:
+            source = content.original
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    # 读取已有的记录，返回`{(page_idx, content_idx): (digest, translation)}`
+    # header：和记录文件头部比对的信息（例如源文件、目标语言），不一致时认为记录无效
+    def load(self, header: dict) -> dict:
+        records = {}
+        if not os.path.exists(self.journal_path):
+            return records
+
+        with open(self.journal_path, "r", encoding="utf-8") as journal_file:
+            for line_idx, line in enumerate(journal_file):
+                try:
+                    record = simplejson.loads(line)
+                except simplejson.JSONDecodeError:
+                    # 最后一行可能在写入时被中断，直接丢弃
+                    LOG.warning(f"断点记录的第 {line_idx + 1} 行已损坏，跳过")
+                    continue
+                if line_idx == 0:
+                    if record != header:
+                        LOG.warning(f"断点记录和本次翻译不匹配，不从断点恢复：{self.journal_path}")
+                        return {}
+                    continue
+                records[(record["page"], record["content"])] = (record["digest"], record["translation"])
+
+        return records
+
+    # 打开记录文件，`resume=False`或者已有记录的头部和`header`不一致时，清空已有的记录并写入新的头部
+    # 否则新的记录会追加到不匹配的头部之后，之后恢复时全部被忽略
+    def open(self, header: dict, resume: bool):
+        append = resume and self._read_header() == header
+        self._file = open(self.journal_path, "a" if append else "w", encoding="utf-8")
+        if not append:
+            self._write_line(header)
+            self._sync()
+
+    # 追加一条翻译结果，`TABLE`的翻译结果（`DataFrame`）以行数组的形式记录
+    def record(self, page_idx: int, content_idx: int, content: Content, translation: any):
+        if isinstance(translation, pd.DataFrame):
+            translation = translation.values.tolist()
+        with self._lock:
+            self._write_line({
+                "page": page_idx,
+                "content": content_idx,
+                "digest": self.source_digest(content),
+                "translation": translation,
+            })
+            self._count += 1
+            if self._count % self.sync_interval == 0:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    # 翻译完成并保存结果之后，删除记录文件
+    def remove(self):
+        self.close()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    # 读取记录文件的头部，文件不存在或者头部已损坏时返回`None`
+    def _read_header(self) -> dict:
+        if not os.path.exists(self.journal_path):
+            return None
+        with open(self.journal_path, "r", encoding="utf-8") as journal_file:
+            try:
+                return simplejson.loads(journal_file.readline())
+            except simplejson.JSONDecodeError:
+                return None
+
+    def _write_line(self, data: dict):
+        self._file.write(simplejson.dumps(data, ensure_ascii=False) + "\n")
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
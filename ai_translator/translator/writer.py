@@ -1,7 +1,15 @@
-import imghdr
-import tempfile
+import collections
+import io
+import itertools
 import os
 
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+import fitz
+import pandas as pd
+import simplejson
+
 from reportlab.lib import colors, pagesizes, utils
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.pdfbase import pdfmetrics
@@ -10,59 +18,151 @@ from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
 )
 
-from datetime import datetime
-
 from ..book import Book, Page, Content, ContentType, TableContent
 from ..utils import LOG
 
+from .image_cache import ImageCache
+
 
 class Writer:
 
+    # 图片格式的文件头，`reportlab`可以直接读取这些格式，其他数据（例如未压缩的像素数据）不写入
+    IMAGE_SIGNATURES = (
+        (b"\xff\xd8\xff", "jpeg"),
+        (b"\x89PNG\r\n\x1a\n", "png"),
+        (b"GIF87a", "gif"),
+        (b"GIF89a", "gif"),
+        (b"II*\x00", "tiff"),
+        (b"MM\x00*", "tiff"),
+        (b"BM", "bmp"),
+    )
+
+    # 多进程渲染`PDF`时，每个子进程一次渲染的页数
+    RENDER_CHUNK_PAGES = 10
+
+    # 覆盖写入译文时使用的字体（`fitz`内置的中文字体）和最小字号
+    OVERLAY_FONT_NAME = "china-s"
+    OVERLAY_MIN_FONT_SIZE = 4
+
+    # 文本格式的输出文件的扩展名，其他格式都保存为`PDF`
+    TEXT_EXTENSIONS = {
+        "markdown": ".md",
+        "jsonl": ".jsonl",
+        "text": ".txt",
+    }
+
+    # 写入文本格式时，每写入多少页就同步到磁盘一次，中断后已经写入的页面不会丢失
+    SYNC_INTERVAL_PAGES = 10
+
+    # 图片缓存，为`None`时图片只保存在内存中
+    image_cache: ImageCache
+
     # 构造函数
-    def __init__(self):
-        pass
+    def __init__(self, image_cache: ImageCache = None):
+        self.image_cache = image_cache
+        # 当前文档中的图片：`{摘要: 图片}`，相同的图片只解码一次，在`PDF`中只保存一份
+        self._image_sources = {}
+        # `PDF`中同一个图片对象的摘要：`{objid: 摘要}`，重复出现时不再读取数据
+        self._image_digests = {}
 
     # 保存翻译结果
     # book：`Book`对象
     # output_file_path：输出文件的路径
     # file_format：输出文件的格式
-    def save_translated_book(self, book: Book, output_file_path: str = None, file_format: str = "PDF"):
+    # render_workers：渲染`PDF`使用的进程数量，默认为`1`，即在当前进程中渲染
+    def save_translated_book(self, book: Book, output_file_path: str = None, file_format: str = "PDF",
+                             render_workers: int = 1):
+        self.save_translated_pages(book, book.pages, output_file_path, file_format, render_workers)
+
+    # 逐页保存翻译结果
+    # book：`Book`对象，提供原文件路径等信息
+    # pages：`Page`的可迭代对象，可以是生成器，每拿到一页就写入一页
+    # output_file_path：输出文件的路径
+    # file_format：输出文件的格式
+    # render_workers：渲染`PDF`使用的进程数量，大于`1`时，将页面分段交给多个进程渲染，再合并成一个文件
+    def save_translated_pages(self, book: Book, pages: Iterable[Page], output_file_path: str = None,
+                              file_format: str = "PDF", render_workers: int = 1):
 
         # 如果想要翻译成`PDF`格式，就调用对应的方法
         if file_format.lower() == "pdf":
-            self._save_translated_book_pdf(book, output_file_path)
+            self._save_translated_book_pdf(book, pages, output_file_path, render_workers)
 
-        # 如果想要翻译成`MARKDOWN`格式，就调用对应的方法
-        elif file_format.lower() == 'markdown':
-            self._save_translated_book_markdown(book, output_file_path)
+        # 保留原`PDF`的排版，在原文的位置上覆盖写入译文
+        elif file_format.lower() == "pdf_overlay":
+            self._save_translated_book_overlay(book, pages, output_file_path)
+
+        # 如果想要翻译成`MARKDOWN`、`JSONL`或者纯文本格式，就逐页追加写入
+        elif file_format.lower() in self.TEXT_EXTENSIONS:
+            self._save_translated_book_text(book, pages, output_file_path, file_format.lower())
 
         # 其他的就暂不支持
         else:
             raise Exception(f"暂时不支持保存为 {file_format} 文件")
 
-    def _save_translated_book_pdf(self, book: Book, output_file_path: str = None):
+    # 获取输出文件的路径，如果输出路径是`None`，就在原文件路径下创建输出文件
+    def get_output_file_path(self, pdf_file_path: str, output_file_path: str = None, file_format: str = "PDF") -> str:
+        if output_file_path is not None:
+            return output_file_path
+        return pdf_file_path.replace('.pdf', '_translated' + self.get_output_extension(file_format))
+
+    # 获取输出文件的扩展名
+    @classmethod
+    def get_output_extension(cls, file_format: str) -> str:
+        return cls.TEXT_EXTENSIONS.get(file_format.lower(), ".pdf")
 
-        # 如果输出路径是`None`，就在原文件路径下创建输出文件
-        if output_file_path is None:
-            output_file_path = book.pdf_file_path.replace('.pdf', '_translated.pdf')
+    def _save_translated_book_pdf(self, book: Book, pages: Iterable[Page], output_file_path: str = None,
+                                  render_workers: int = 1):
+
+        output_file_path = self.get_output_file_path(book.pdf_file_path, output_file_path, "PDF")
 
         LOG.info(f"开始翻译")
         LOG.info(f"原`PDF`路径为：{book.pdf_file_path}")
         LOG.info(f"翻译后的`PDF`路径为：{output_file_path}")
 
         # 注册中文字体
+        self._register_fonts()
+
+        # 页边距以第一页为准，所以先取出第一页
+        pages = iter(pages)
+        first_page = next(pages, None)
+        if first_page is not None:
+            pages = itertools.chain([first_page], pages)
+
+        left_margin = first_page.left_margin if first_page else 45
+        right_margin = first_page.right_margin if first_page else 45
+        top_margin = first_page.top_margin if first_page else 30
+        margins = (left_margin, right_margin, top_margin)
+
+        if render_workers > 1:
+            self._render_pdf_parallel(pages, output_file_path, margins, render_workers)
+        else:
+            image_count = self._render_pdf(pages, output_file_path, margins)
+            if image_count:
+                LOG.info(f"写入了 {image_count} 个不同的图片")
+
+        if self.image_cache:
+            LOG.info(f"图片缓存：{self.image_cache.stats()}")
+
+        LOG.info(f"翻译完成：{output_file_path}")
+
+    # 注册中文字体
+    @staticmethod
+    def _register_fonts():
         font_path = "../fonts/simsun.ttc"
         pdfmetrics.registerFont(TTFont('SimSun', font_path))
         pdfmetrics.registerFont(TTFont('SimSun-Bold', font_path))
 
-        left_margin = book.pages[0].left_margin if book.pages else 45
-        right_margin = book.pages[0].right_margin if book.pages else 45
-        top_margin = book.pages[0].top_margin if book.pages else 30
-        bottom_margin = book.pages[0].bottom_margin if book.pages else 30
+    # 将`pages`渲染到`output`（文件路径或者`BytesIO`）中，返回不同图片的数量
+    # margins：左、右、上页边距
+    # start：`pages`中第一页在整本书中的下标，大于`0`时和整本渲染一样，在第一页之前添加分页符
+    # last：`pages`是否包含最后一页，不包含时在最后添加分页符和占位的一页，使末尾的空白页和整本渲染时相同
+    def _render_pdf(self, pages: Iterable[Page], output: any, margins: tuple, start: int = 0,
+                    last: bool = True) -> int:
+        left_margin, right_margin, top_margin = margins
 
         # 创建`PDF`文档，`pagesizes`：页面大小，`letter`为标准信纸大小
         doc = SimpleDocTemplate(
-            output_file_path,
+            output,
             pagesizes=pagesizes.letter,
             leftMargin=left_margin,
             rightMargin=right_margin,
@@ -73,125 +173,411 @@ class Writer:
         # 获取样式表对象
         style = getSampleStyleSheet()
 
+        # 每一页的`flowable`在`doc.build`需要时才生成，不需要先把整本书的`story`都放在内存中
+        page_stories = self._iter_pages_story(pages, start)
+        if not last:
+            page_stories = itertools.chain(page_stories, [[PageBreak(), Spacer(1, 1)]])
+        story = _StreamingStory(page_stories)
+
+        self._image_sources = {}
+        self._image_digests = {}
+        try:
+            doc.build(story)
+            return len(self._image_sources)
+        finally:
+            self._image_sources = {}
+            self._image_digests = {}
+
+    # 多进程渲染：每`RENDER_CHUNK_PAGES`页交给一个子进程渲染成`PDF`，再按照页码顺序用`fitz`合并
+    # 每一页都从分页符之后的新页面开始，所以分段渲染和整本渲染的排版相同
+    # 除第一段外，每一段都和整本渲染一样以分页符开头，除最后一段外，每一段都以分页符和占位的一页结尾
+    # 合并时去掉开头的空白页和结尾的占位页
+    def _render_pdf_parallel(self, pages: Iterable[Page], output_file_path: str, margins: tuple, workers: int):
+        image_cache_dir = self.image_cache.cache_dir if self.image_cache else None
+        merged = fitz.open()
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = collections.deque()
+            try:
+                for start, chunk, last in self._iter_page_chunks(pages):
+                    futures.append((start, last, executor.submit(_render_page_range, chunk, margins, start, last,
+                                                                 image_cache_dir)))
+                    # 最多有`workers * 2`段正在渲染或等待合并，内存占用和页数无关
+                    while len(futures) >= workers * 2:
+                        self._merge_pdf(merged, *futures.popleft())
+                while futures:
+                    self._merge_pdf(merged, *futures.popleft())
+            finally:
+                for _, _, future in futures:
+                    future.cancel()
+
+        if not merged.page_count:
+            # 没有任何页面时，`fitz`无法保存，和单进程渲染一样生成一个空白页
+            merged.close()
+            self._render_pdf([], output_file_path, margins)
+            return
+
+        # 合并各段中相同的对象（例如每一段都引用的图片），只保存一份
+        merged.save(output_file_path, garbage=4, deflate=True)
+        merged.close()
+
+    # 将页面按`RENDER_CHUNK_PAGES`分段，返回`(第一页的下标, 页面, 是否是最后一段)`
+    # 图片数据读取成`bytes`，以便传给子进程
+    def _iter_page_chunks(self, pages: Iterable[Page]) -> Iterator[tuple]:
+        pages = iter(pages)
+        start = 0
+        # 多取一段，用来判断当前段是否是最后一段
+        chunk = list(itertools.islice(pages, self.RENDER_CHUNK_PAGES))
+        while chunk:
+            next_chunk = list(itertools.islice(pages, self.RENDER_CHUNK_PAGES))
+            for page in chunk:
+                for content in page.contents:
+                    if content.content_type == ContentType.IMAGE and "stream" in content.original:
+                        image = {key: value for key, value in content.original.items()
+                                 if isinstance(value, (int, float, str, bool, tuple))}
+                        image["data"] = self._get_image_data(content.original)
+                        content.original = image
+                        content.translation = image
+            yield start, chunk, not next_chunk
+            start += len(chunk)
+            chunk = next_chunk
+
+    @staticmethod
+    def _merge_pdf(merged: fitz.Document, start: int, last: bool, future):
+        with fitz.open("pdf", future.result()) as part:
+            # 去掉开头的分页符之前的空白页，以及结尾的占位页
+            from_page = 1 if start else 0
+            to_page = part.page_count - 1 if last else part.page_count - 2
+            if to_page >= from_page:
+                merged.insert_pdf(part, from_page=from_page, to_page=to_page)
+
+    # 逐页生成`flowable`，除第一页外，每一页之前添加一个分页符，`start`是第一页在整本书中的下标
+    def _iter_pages_story(self, pages: Iterable[Page], start: int = 0) -> Iterator[list]:
+        for page_idx, page in enumerate(pages, start):
+            story = [] if page_idx == 0 else [PageBreak()]
+            story.extend(self._get_page_story(page, page_idx))
+            yield story
+
+    # 生成一页的`flowable`
+    def _get_page_story(self, page: Page, page_idx: int) -> list:
         story = []
 
-        for page_idx, page in enumerate(book.pages):
-            for content_idx, content in enumerate(page.contents):
-
-                if content.status:
-
-                    # `TEXT`类型的翻译
-                    if content.content_type == ContentType.TEXT:
-
-                        # 获取翻译后的文本
-                        text: str = content.translation
-
-                        # 创建文本`Style`
-                        simsun_style = ParagraphStyle(
-                            'SimSun',
-                            fontName="SimSun-Bold" if content.is_bold else "SimSun",
-                            fontSize=content.font_size,
-                            leading=content.leading,
-                            firstLineIndent=content.first_line_offset,
-                            spaceBefore=content.space_before,
-                            textColor=content.text_color
-                        )
-
-                        # 添加段落到`story`中
-                        story.append(Paragraph(text, simsun_style))
-
-
-                    # `TABLE`类型的翻译
-                    elif content.content_type == ContentType.TABLE:
-                        table = content.translation
-                        table_style = TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                            ('FONTNAME', (0, 0), (-1, 0), 'SimSun'),  # 更改表头字体为 "SimSun"
-                            ('FONTSIZE', (0, 0), (-1, 0), 14),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                            ('FONTNAME', (0, 1), (-1, -1), 'SimSun'),  # 更改表格中的字体为 "SimSun"
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                        ])
-                        pdf_table = Table(
-                            table.values.tolist(),
-                            hAlign="LEFT",
-                            colWidths=content.col_widths,
-                            spaceBefore=content.space_before,
-                        )
-                        pdf_table.setStyle(table_style)
-                        story.append(pdf_table)
-
-                    elif content.content_type == ContentType.IMAGE:
-                        if not os.path.exists('images'):
-                            os.makedirs(folder_name)
-                        image = content.original
-                        img_data = image["stream"].get_data()
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".img") as temp_file:
-                            temp_file.write(img_data)
-                            temp_file_path = temp_file.name
-                        image_format = imghdr.what(temp_file_path)
-                        temp_file.close()
-                        img_data = image["stream"].get_data()
-                        if not image_format: continue
-                        if not image_format: image_format = "jpeg"
-                        img_name = f"images/{str(datetime.timestamp(datetime.now()))}-{page_idx}-{content_idx}.{image_format}"
-                        with open(img_name, "wb") as img_file:
-                            img_file.write(img_data)
-                            img = Image(img_name, width=image["width"], height=image["height"])
-                            image_table = Table([[img]], hAlign="LEFT")
-                            image_table.setStyle(TableStyle([
-                                ("LEFTPADDING", (0, 0), (-1, -1), 0),  # 设置左侧边距
-                            ]))
-                            story.append(image_table)
-
-            # 如果`page`不是倒数第一页，就添加一个分页符
-            if page != book.pages[-1]:
-                story.append(PageBreak())
-
-        doc.build(story)
-
-        folder_path = 'images/'
-        for filename in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, filename)
-            os.remove(file_path)
+        for content_idx, content in enumerate(page.contents):
+
+            if content.status:
+
+                # `TEXT`类型的翻译
+                if content.content_type == ContentType.TEXT:
+
+                    # 获取翻译后的文本
+                    text: str = content.translation
+
+                    # 创建文本`Style`
+                    simsun_style = ParagraphStyle(
+                        'SimSun',
+                        fontName="SimSun-Bold" if content.is_bold else "SimSun",
+                        fontSize=content.font_size,
+                        leading=content.leading,
+                        firstLineIndent=content.first_line_offset,
+                        spaceBefore=content.space_before,
+                        textColor=content.text_color
+                    )
+
+                    # 添加段落到`story`中
+                    story.append(Paragraph(text, simsun_style))
+
+
+                # `TABLE`类型的翻译
+                elif content.content_type == ContentType.TABLE:
+                    table = content.translation
+                    table_style = TableStyle([
+                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                        ('FONTNAME', (0, 0), (-1, 0), 'SimSun'),  # 更改表头字体为 "SimSun"
+                        ('FONTSIZE', (0, 0), (-1, 0), 14),
+                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+                        ('FONTNAME', (0, 1), (-1, -1), 'SimSun'),  # 更改表格中的字体为 "SimSun"
+                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+                        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+                    ])
+                    pdf_table = Table(
+                        table.values.tolist(),
+                        hAlign="LEFT",
+                        colWidths=content.col_widths,
+                        spaceBefore=content.space_before,
+                    )
+                    pdf_table.setStyle(table_style)
+                    story.append(pdf_table)
+
+                elif content.content_type == ContentType.IMAGE:
+                    image_table = self._get_image_table(content.original)
+                    if image_table is not None:
+                        story.append(image_table)
+
+        return story
+
+    # 生成图片的`flowable`，无法识别格式的图片返回`None`
+    def _get_image_table(self, image: dict):
+        source = self._get_image_source(image)
+        if source is None:
+            return None
+        if isinstance(source, str):
+            img = Image(source, width=image["width"], height=image["height"])
+        else:
+            img = _SharedImage(source, width=image["width"], height=image["height"])
+        image_table = Table([[img]], hAlign="LEFT")
+        image_table.setStyle(TableStyle([
+            ("LEFTPADDING", (0, 0), (-1, -1), 0),  # 设置左侧边距
+        ]))
+        return image_table
+
+    # 按图片内容的摘要获取图片：配置了图片缓存时是缓存文件的路径，否则是内存中的`ImageReader`
+    # 同一个文档中相同的图片（例如每一页的`Logo`、水印）共用同一份数据，`reportlab`只嵌入一次
+    def _get_image_source(self, image: dict):
+        stream = image.get("stream")
+        objid = getattr(stream, "objid", None)
+        digest = self._image_digests.get(objid) if objid is not None else None
+        img_data = None
+        if digest is None:
+            img_data = self._get_image_data(image)
+            digest = ImageCache.digest(img_data)
+            if objid is not None:
+                self._image_digests[objid] = digest
+        if digest in self._image_sources:
+            return self._image_sources[digest]
+
+        image_format = self.get_image_format(img_data)
+        if image_format is None:
+            source = None
+        elif self.image_cache:
+            source = self.image_cache.get_path(img_data, image_format, digest)
+        else:
+            source = utils.ImageReader(io.BytesIO(img_data))
+        self._image_sources[digest] = source
+        return source
+
+    # 根据文件头判断图片的格式，无法识别时返回`None`
+    @classmethod
+    def get_image_format(cls, data: bytes) -> str:
+        for signature, image_format in cls.IMAGE_SIGNATURES:
+            if data.startswith(signature):
+                return image_format
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return "webp"
+        return None
+
+    # 获取图片的数据，多进程解析时图片数据已经读取到`data`中
+    def _get_image_data(self, image: dict) -> bytes:
+        if "data" in image:
+            return image["data"]
+        return image["stream"].get_data()
+
+    # 在原`PDF`上覆盖写入译文：删除原文所在区域的文字，再把译文写入同一个区域
+    # 页面、矢量图形和图片原样保留，不需要重新渲染，耗时只和文字的数量有关
+    def _save_translated_book_overlay(self, book: Book, pages: Iterable[Page], output_file_path: str = None):
+
+        output_file_path = self.get_output_file_path(book.pdf_file_path, output_file_path, "PDF")
 
-        LOG.info(f"翻译完成：{output_file_path}")
+        LOG.info(f"开始翻译")
+        LOG.info(f"原`PDF`路径为：{book.pdf_file_path}")
+        LOG.info(f"翻译后的`PDF`路径为：{output_file_path}")
+
+        with fitz.open(book.pdf_file_path) as pdf_doc:
+            page_count = 0
+            for page_idx, page in enumerate(pages):
+                self._overlay_page(pdf_doc[page_idx], page)
+                page_count += 1
 
-    def _save_translated_book_markdown(self, book: Book, output_file_path: str = None):
+            # 只翻译了前几页时，只保留这些页
+            if 0 < page_count < pdf_doc.page_count:
+                pdf_doc.select(list(range(page_count)))
 
-        # 如果输出路径是`None`，就在原文件路径下创建输出文件
-        if output_file_path is None:
-            output_file_path = book.pdf_file_path.replace('.pdf', '_translated.md')
+            pdf_doc.save(output_file_path, garbage=3, deflate=True)
+
+        LOG.info(f"翻译完成：{output_file_path}")
+
+    # 覆盖写入一页的译文
+    def _overlay_page(self, pdf_page: fitz.Page, page: Page):
+        # `(区域, 译文, 字号, 颜色)`
+        overlays = []
+        for content in page.contents:
+            if not content.status or content.bbox is None: continue
+
+            if content.content_type == ContentType.TEXT:
+                if content.translation != content.original:
+                    overlays.append((content.bbox, content.translation, content.font_size,
+                                     self._get_rgb_color(content.text_color)))
+
+            elif content.content_type == ContentType.TABLE:
+                overlays.extend(self._get_table_overlays(content))
+
+        if not overlays:
+            return
+
+        # 先删除所有原文，再写入译文，否则后写入的译文会被一起删除
+        for bbox, _, _, _ in overlays:
+            pdf_page.add_redact_annot(fitz.Rect(bbox), fill=False)
+        pdf_page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE, graphics=fitz.PDF_REDACT_LINE_ART_NONE)
+
+        for bbox, text, font_size, color in overlays:
+            self._insert_text_fit(pdf_page, fitz.Rect(bbox), text, font_size, color)
+
+    # 表格中需要覆盖写入的单元格，译文和单元格的区域按行列对应
+    def _get_table_overlays(self, content: TableContent) -> list:
+        if content.cell_bboxes is None or not isinstance(content.translation, pd.DataFrame):
+            return []
+        rows = content.get_rows()
+        translated_rows = content.translation.values.tolist()
+        overlays = []
+        for row, translated_row, bbox_row in zip(rows, translated_rows, content.cell_bboxes):
+            for cell, translated_cell, bbox in zip(row, translated_row, bbox_row):
+                if bbox is None or not translated_cell or translated_cell == cell: continue
+                overlays.append((bbox, str(translated_cell), content.font_size, (0, 0, 0)))
+        return overlays
+
+    # 在`rect`中写入`text`，写不下时逐步缩小字号，缩小到最小字号仍然写不下时，向下扩展区域
+    def _insert_text_fit(self, pdf_page: fitz.Page, rect: fitz.Rect, text: str, font_size: float, color: tuple):
+        font_size = font_size or 12
+        # 原文的区域只包括文字本身的高度，留出行距的空间，使同样字号的一行译文可以写入
+        rect = fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y1 + font_size * 0.5)
+        while font_size >= self.OVERLAY_MIN_FONT_SIZE:
+            # 写不下时返回负数，并且不会写入任何内容
+            if pdf_page.insert_textbox(rect, text, fontname=self.OVERLAY_FONT_NAME, fontsize=font_size,
+                                       color=color) >= 0:
+                return
+            font_size *= 0.9
+        rect = fitz.Rect(rect.x0, rect.y0, rect.x1, pdf_page.rect.y1)
+        pdf_page.insert_textbox(rect, text, fontname=self.OVERLAY_FONT_NAME, fontsize=self.OVERLAY_MIN_FONT_SIZE,
+                                color=color)
+
+    # 将`pdfplumber`的颜色（灰度、`RGB`或`CMYK`）转换成`RGB`
+    @staticmethod
+    def _get_rgb_color(color: any) -> tuple:
+        if not isinstance(color, (list, tuple)) or not all(isinstance(value, (int, float)) for value in color):
+            return 0, 0, 0
+        if len(color) == 1:
+            return color[0], color[0], color[0]
+        if len(color) == 3:
+            return tuple(color)
+        if len(color) == 4:
+            c, m, y, k = color
+            return (1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k)
+        return 0, 0, 0
+
+    # 逐页追加写入文本格式的翻译结果，每一页翻译完成后立即写入，内存中不保留已经写入的页面
+    # 写入过程中可以随时查看（或者`tail -f`）已经完成的部分
+    def _save_translated_book_text(self, book: Book, pages: Iterable[Page], output_file_path: str = None,
+                                   file_format: str = "markdown"):
+
+        output_file_path = self.get_output_file_path(book.pdf_file_path, output_file_path, file_format)
 
         LOG.info(f"开始翻译")
         LOG.info(f"原`PDF`路径为：{book.pdf_file_path}")
-        LOG.info(f"翻译后的`PDF`路径为：{output_file_path}")
+        LOG.info(f"翻译后的文件路径为：{output_file_path}")
 
-        with open(output_file_path, 'w', encoding='utf-8') as output_file:
-            for page in book.pages:
-                for content in page.contents:
-                    if content.status:
+        format_page = {
+            "markdown": self._format_page_markdown,
+            "jsonl": self._format_page_jsonl,
+            "text": self._format_page_text,
+        }[file_format]
 
-                        if content.content_type == ContentType.TEXT:
-                            text = content.translation
-                            output_file.write(text + '\n\n')
+        with open(output_file_path, 'w', encoding='utf-8') as output_file:
+            page_idx = -1
+            for page_idx, page in enumerate(pages):
+                output_file.write(format_page(page_idx, page))
 
-                        elif content.content_type == ContentType.TABLE:
-                            table = content.translation
-                            header = '| ' + ' | '.join(str(column) for column in table.columns) + ' |' + '\n'
-                            separator = '| ' + ' | '.join(['---'] * len(table.columns)) + ' |' + '\n'
-                            # body = '\n'.join(['| ' + ' | '.join(row) + ' |' for row in table.values.tolist()]) + '\n\n'
-                            body = '\n'.join(
-                                ['| ' + ' | '.join(str(cell) for cell in row) + ' |' for row in
-                                 table.values.tolist()]) + '\n\n'
-                            output_file.write(header + separator + body)
+                # 每写完一页就刷新缓冲区，方便在翻译过程中查看结果
+                output_file.flush()
+                if (page_idx + 1) % self.SYNC_INTERVAL_PAGES == 0:
+                    os.fsync(output_file.fileno())
 
-                if page != book.pages[-1]:
-                    output_file.write('---\n\n')
+            if (page_idx + 1) % self.SYNC_INTERVAL_PAGES != 0:
+                os.fsync(output_file.fileno())
 
         LOG.info(f"翻译完成：{output_file_path}")
+
+    # 一页`MARKDOWN`，除第一页外，每一页之前添加一个分隔线
+    @staticmethod
+    def _format_page_markdown(page_idx: int, page: Page) -> str:
+        parts = ['---\n\n'] if page_idx > 0 else []
+        for content in page.contents:
+            if content.status:
+
+                if content.content_type == ContentType.TEXT:
+                    parts.append(content.translation + '\n\n')
+
+                elif content.content_type == ContentType.TABLE:
+                    table = content.translation
+                    header = '| ' + ' | '.join(str(column) for column in table.columns) + ' |' + '\n'
+                    separator = '| ' + ' | '.join(['---'] * len(table.columns)) + ' |' + '\n'
+                    body = '\n'.join(
+                        ['| ' + ' | '.join(str(cell) for cell in row) + ' |' for row in
+                         table.values.tolist()]) + '\n\n'
+                    parts.append(header + separator + body)
+        return ''.join(parts)
+
+    # 一页`JSONL`：每一页一行`JSON`，`TABLE`的翻译结果以行数组的形式记录，图片不写入
+    @staticmethod
+    def _format_page_jsonl(page_idx: int, page: Page) -> str:
+        contents = []
+        for content in page.contents:
+            if content.status:
+
+                if content.content_type == ContentType.TEXT:
+                    contents.append({"type": "text", "translation": content.translation})
+
+                elif content.content_type == ContentType.TABLE:
+                    rows = [[str(cell) for cell in row] for row in content.translation.values.tolist()]
+                    contents.append({"type": "table", "rows": rows})
+        return simplejson.dumps({"page": page_idx, "contents": contents}, ensure_ascii=False) + '\n'
+
+    # 一页纯文本：段落之间空一行，表格的单元格之间用制表符分隔，页面之间用换页符（`\f`）分隔
+    @staticmethod
+    def _format_page_text(page_idx: int, page: Page) -> str:
+        parts = ['\f'] if page_idx > 0 else []
+        for content in page.contents:
+            if content.status:
+
+                if content.content_type == ContentType.TEXT:
+                    parts.append(content.translation + '\n\n')
+
+                elif content.content_type == ContentType.TABLE:
+                    parts.append('\n'.join('\t'.join(str(cell) for cell in row)
+                                           for row in content.translation.values.tolist()) + '\n\n')
+        return ''.join(parts)
+
+
+# 在子进程中渲染一段页面，返回`PDF`文件的内容
+def _render_page_range(pages: [Page], margins: tuple, start: int, last: bool, image_cache_dir: str = None) -> bytes:
+    Writer._register_fonts()
+    writer = Writer(ImageCache(image_cache_dir) if image_cache_dir else None)
+    output = io.BytesIO()
+    writer._render_pdf(pages, output, margins, start, last)
+    return output.getvalue()
+
+
+# 使用已经创建好的`ImageReader`的图片，多个`_SharedImage`共用同一个`ImageReader`时，图片只解码一次
+class _SharedImage(Image):
+
+    def __init__(self, reader: utils.ImageReader, width: float, height: float):
+        self._img = reader
+        super().__init__(reader.fp, width=width, height=height, lazy=0)
+
+
+# `doc.build`每处理一个`flowable`都会调用`len(story)`，在`story`被取空时，再从`page_stories`中取出下一页的`flowable`
+class _StreamingStory(list):
+
+    def __init__(self, page_stories: Iterator[list]):
+        super().__init__()
+        self._page_stories = page_stories
+
+    def __len__(self):
+        while not super().__len__():
+            page_story = next(self._page_stories, None)
+            if page_story is None:
+                break
+            self.extend(page_story)
+        return super().__len__()
@@ -1,4 +1,6 @@
-from .argument_parser import ArgumentParser
+from .argument_parser import ArgumentParser, BatchArgumentParser
 from .config_loader import ConfigLoader
 from .logger import LOG
-from .common import Common
\ No newline at end of file
+from .common import Common
+from .tokenizer import estimate_tokens
+from .metrics import METRICS, Metrics
@@ -59,8 +59,113 @@ class ArgumentParser:
             help="PDF文件的的`format`",
         )
 
+        self.parser.add_argument(
+            "--max_workers",
+            type=int,
+            help="同时进行中的翻译请求数量",
+        )
+
+        self.parser.add_argument(
+            "--batch_chars",
+            type=int,
+            help="将连续的段落合并到一个请求中翻译时，每个请求的原文字符数上限，`0`表示不合并",
+        )
+
+        self.parser.add_argument(
+            "--parse_workers",
+            type=int,
+            help="解析`PDF`使用的进程数量",
+        )
+
+        self.parser.add_argument(
+            "--render_workers",
+            type=int,
+            help="渲染`PDF`使用的进程数量",
+        )
+
+        self.parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="从上一次中断的断点记录中恢复翻译",
+        )
+
+        self.parser.add_argument(
+            "--streaming",
+            action="store_true",
+            help="逐页流水线处理，解析、翻译、写入同时进行",
+        )
+
+        self.parser.add_argument(
+            "--structured",
+            action="store_true",
+            help="合并翻译时使用`JSON`格式的请求和结果，只重新请求缺失或无效的段落",
+        )
+
+        self.parser.add_argument(
+            "--metrics_path",
+            type=str,
+            help="翻译结束后导出运行指标的文件路径，`.json`结尾时导出`JSON`汇总，否则导出`Prometheus`文本格式",
+        )
+
     def parse_arguments(self):
         args = self.parser.parse_args()
         if args.model_type == "OpenAIModel" and (not args.openai_api_key or not args.openai_model):
             self.parser.error("当`model_type=OpenAIModel`时，`--openai_api_key`和`--openai_model`为必填项")
         return args
+
+
+# 批量翻译的参数：在单个文件的参数基础上，增加输入目录、任务队列、任务清单等
+class BatchArgumentParser(ArgumentParser):
+
+    def __init__(self):
+        super().__init__()
+        self.parser.description = "PDF批量翻译器"
+
+        self.parser.add_argument(
+            "--input",
+            type=str,
+            action="append",
+            help="要翻译的`PDF`文件所在的目录，或者`glob`模式（例如`books/**/*.pdf`），可以指定多次",
+        )
+
+        self.parser.add_argument(
+            "--queue",
+            type=str,
+            help="任务队列文件（`SQLite`）的路径，重新运行时继续处理没有完成的任务",
+        )
+
+        self.parser.add_argument(
+            "--output_dir",
+            type=str,
+            help="翻译结果的输出目录，为空时输出到`PDF`文件的旁边",
+        )
+
+        self.parser.add_argument(
+            "--book_workers",
+            type=int,
+            help="同时翻译的`PDF`文件数量",
+        )
+
+        self.parser.add_argument(
+            "--max_concurrent_requests",
+            type=int,
+            help="所有`PDF`文件同时进行中的模型请求总数上限",
+        )
+
+        self.parser.add_argument(
+            "--manifest",
+            type=str,
+            help="任务清单（`JSON`）的路径，记录每个任务的状态和结果",
+        )
+
+        self.parser.add_argument(
+            "--max_attempts",
+            type=int,
+            help="每个任务最多尝试的次数",
+        )
+
+        self.parser.add_argument(
+            "--retry_failed",
+            action="store_true",
+            help="将之前失败的任务重新放回队列",
+        )
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+import simplejson
+
+
+class _Histogram:
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+
+    # 根据桶估算分位数，返回分位数所在桶的上限，超过最大的桶时返回`inf`
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+# 运行指标：计数器（请求数、`token`数、错误数等）和直方图（请求耗时、各阶段耗时）
+# 可以导出为`Prometheus`的文本格式，或者`JSON`格式的汇总
+class Metrics:
+
+    # 耗时直方图的桶，单位：秒
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    # 指标名称的前缀
+    PREFIX = "ai_translator_"
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    # 计数器增加`value`
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, self._label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    # 记录一次耗时（或其他数值）到直方图中
+    def observe(self, name: str, value: float, **labels):
+        key = (name, self._label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.LATENCY_BUCKETS)
+            histogram.observe(value)
+
+    # 统计`with`代码块的耗时
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started_at, **labels)
+
+    # 清空所有指标
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # 导出为`Prometheus`的文本格式
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {self.PREFIX}{name} counter")
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{self.PREFIX}{name}{self._format_labels(labels)} {value}")
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {self.PREFIX}{name} histogram")
+                for (histogram_name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if histogram_name != name: continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_labels = self._format_labels(labels + (("le", str(bound)),))
+                        lines.append(f"{self.PREFIX}{name}_bucket{bucket_labels} {cumulative}")
+                    inf_labels = self._format_labels(labels + (("le", "+Inf"),))
+                    lines.append(f"{self.PREFIX}{name}_bucket{inf_labels} {histogram.count}")
+                    lines.append(f"{self.PREFIX}{name}_sum{self._format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{self.PREFIX}{name}_count{self._format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    # 导出为`JSON`格式的汇总：计数器的值，直方图的次数、总和、平均值和分位数
+    def to_dict(self) -> dict:
+        summary = {"counters": [], "histograms": []}
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                summary["counters"].append({"name": name, "labels": dict(labels), "value": value})
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                summary["histograms"].append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "mean": round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                })
+        return summary
+
+    # 写入文件，`.json`结尾时写入`JSON`汇总，否则写入`Prometheus`的文本格式
+    def write(self, file_path: str):
+        folder = os.path.dirname(file_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if file_path.endswith(".json"):
+            content = simplejson.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        else:
+            content = self.to_prometheus()
+        with open(file_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(content)
+
+    # 计数器的值，`labels`为空时累加所有标签
+    def get_counter(self, name: str, **labels) -> float:
+        label_key = self._label_key(labels)
+        with self._lock:
+            return sum(value for (counter_name, counter_labels), value in self._counters.items()
+                       if counter_name == name and (not labels or counter_labels == label_key))
+
+    @staticmethod
+    def _label_key(labels: dict) -> tuple:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        escaped = []
+        for key, value in labels:
+            value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            escaped.append(f'{key}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+
+# 声明全局变量
+METRICS = Metrics()
@@ -0,0 +1,16 @@
+import re
+
+# 中日韩文字，每个字大约是一个`token`
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]")
+
+# 其他文字，平均每个`token`大约是 4 个字符
+_CHARS_PER_TOKEN = 4
+
+
+# 估算文本的`token`数量，不依赖具体模型的分词器，用于限速和切分段落等只需要近似值的场景
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return cjk_count + (other_count + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
@@ -0,0 +1,83 @@
+import sys
+import os
+import glob
+import time
+
+from collections import Counter
+
+# 获取当前脚本所在的目录
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 获取项目根目录
+project_root = os.path.dirname(script_dir)
+
+# 将项目根目录添加到 Python 路径中
+sys.path.append(project_root)
+
+import pdfplumber
+
+from ai_translator.translator.pdf_parser import PDFParser
+
+
+# 对比段落文字属性的统计耗时：原来每个属性单独遍历一次所有`char`，现在所有属性一起只遍历一次
+# 运行方式：python benchmarks/parser_char_stats.py [PDF文件 ...]，默认使用`tests/*.pdf`
+
+# 原来的实现：每个属性各自遍历一次`lines`和`chars`
+def legacy_char_stats(lines: any) -> (float, float, any, bool):
+    def most_common(key, default):
+        values = []
+        for line in lines:
+            if line['chars']:
+                for char_info in line['chars']:
+                    values.append(char_info[key])
+        if values:
+            return Counter(values).most_common(1)[0][0]
+        return default
+
+    font_size = most_common('size', 24)
+    font_height = most_common('height', 24)
+    text_color = most_common('non_stroking_color', (0, 0, 0))
+    fontname = most_common('fontname', None)
+    return font_size, font_height, text_color, fontname is not None and 'bold' in fontname.lower()
+
+
+# 每一页的所有`line`作为一个段落，同时每一行也单独作为一个段落，覆盖长段落和短段落两种情况
+def load_paragraphs(pdf_file_path: str) -> [list]:
+    paragraphs = []
+    with pdfplumber.open(pdf_file_path) as pdf:
+        for pdf_page in pdf.pages:
+            lines = pdf_page.extract_text_lines()
+            paragraphs.append(lines)
+            paragraphs.extend([line] for line in lines)
+    return paragraphs
+
+
+def measure(func, paragraphs: [list], repeat: int) -> (float, list):
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(lines) for lines in paragraphs]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+if __name__ == "__main__":
+    pdf_files = sys.argv[1:] or sorted(glob.glob(os.path.join(project_root, "tests", "*.pdf")))
+    parser = PDFParser()
+
+    for pdf_file_path in pdf_files:
+        paragraphs = load_paragraphs(pdf_file_path)
+        legacy_time, legacy_results = measure(legacy_char_stats, paragraphs, repeat=20)
+        current_time, current_results = measure(parser._get_para_char_stats, paragraphs, repeat=20)
+
+        if legacy_results != current_results:
+            raise AssertionError(f"统计结果不一致：{pdf_file_path}")
+
+        print(
+            f"{os.path.basename(pdf_file_path)}: "
+            f"段落 {len(paragraphs)} 个，"
+            f"原实现 {legacy_time * 1000:.2f} ms，"
+            f"现实现 {current_time * 1000:.2f} ms，"
+            f"加速 {legacy_time / current_time:.2f}x"
+        )
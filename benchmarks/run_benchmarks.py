@@ -0,0 +1,192 @@
+import sys
+import os
+import argparse
+import glob
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+
+# 获取当前脚本所在的目录
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# 获取项目根目录
+project_root = os.path.dirname(script_dir)
+
+# 将项目根目录添加到 Python 路径中
+sys.path.append(project_root)
+
+from reportlab.lib import pagesizes
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, PageBreak
+from reportlab.lib import colors
+
+from ai_translator.book import Book, ContentType
+from ai_translator.model import MockModel
+from ai_translator.translator import PDFTranslator
+from ai_translator.translator.pdf_parser import PDFParser
+from ai_translator.translator.writer import Writer
+
+
+# 解析 -> 翻译 -> 写入 的基准测试，翻译使用本地的`MockModel`，不发送网络请求
+# 运行方式：python benchmarks/run_benchmarks.py --synthetic-pages 10 50 --latency 0.05 --max-workers 8 --output result.json
+# 默认使用`tests/*.pdf`，结果以`JSON`格式输出，方便对比不同版本的吞吐量和内存占用
+
+SAMPLE_TEXT = (
+    "The quick brown fox jumps over the lazy dog. This pangram contains every letter of the English alphabet "
+    "at least once. Pangrams are often used to test fonts, keyboards, and other text-related tools."
+)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="PDF翻译器的基准测试")
+    parser.add_argument("--pdf", nargs="*", help="需要测试的PDF文件，默认为`tests/*.pdf`")
+    parser.add_argument("--synthetic-pages", nargs="*", type=int, default=[], help="生成指定页数的PDF文件参与测试")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟模型每个请求的平均延迟，单位：秒")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟模型延迟的随机抖动范围，单位：秒")
+    parser.add_argument("--seed", type=int, default=0, help="模拟模型延迟的随机种子")
+    parser.add_argument("--max-workers", type=int, default=1, help="同时进行中的翻译请求数量")
+    parser.add_argument("--batch-chars", type=int, default=0, help="合并翻译时每个请求的原文字符数上限")
+    parser.add_argument("--parse-workers", type=int, default=1, help="解析PDF使用的进程数量")
+    parser.add_argument("--formats", nargs="*", default=["markdown", "PDF"], help="需要测试的输出格式")
+    parser.add_argument("--no-memory", action="store_true", help="不统计内存峰值（统计内存会让耗时变长）")
+    parser.add_argument("--output", type=str, help="结果输出的JSON文件，默认只打印到标准输出")
+    return parser.parse_args()
+
+
+# 生成`pages`页的`PDF`文件，每一页包含标题、若干段落和一个表格
+def make_synthetic_pdf(pages: int, output_file_path: str):
+    style = getSampleStyleSheet()
+    story = []
+    for page_idx in range(pages):
+        story.append(Paragraph(f"Chapter {page_idx + 1}", style["Heading1"]))
+        for paragraph_idx in range(6):
+            story.append(Paragraph(f"{paragraph_idx + 1}. {SAMPLE_TEXT}", style["Normal"]))
+        table = Table([
+            ["Fruit", "Color", "Price (USD)"],
+            ["Apple", "Red", "1.20"],
+            ["Banana", "Yellow", "0.50"],
+            ["Orange", "Orange", "0.80"],
+        ])
+        table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 1, colors.black)]))
+        story.append(table)
+        if page_idx < pages - 1:
+            story.append(PageBreak())
+    SimpleDocTemplate(output_file_path, pagesize=pagesizes.letter).build(story)
+
+
+# 执行`func`，返回`(结果, 耗时, 内存峰值)`
+def run_stage(func, trace_memory: bool):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        seconds = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def count_contents(book: Book) -> int:
+    return sum(
+        1 for page in book.pages for content in page.contents if content.content_type != ContentType.IMAGE
+    )
+
+
+def benchmark_pdf(pdf_file_path: str, args, output_dir: str) -> [dict]:
+    trace_memory = not args.no_memory
+    name = os.path.basename(pdf_file_path)
+    results = []
+
+    def record(stage: str, seconds: float, peak: int, **extra):
+        item = {
+            "pdf": name,
+            "stage": stage,
+            "seconds": round(seconds, 6),
+            "peak_memory_bytes": peak,
+        }
+        item.update(extra)
+        results.append(item)
+        print(f"{name:<40} {stage:<20} {seconds:>10.4f}s", flush=True)
+
+    # 解析
+    book, seconds, peak = run_stage(
+        lambda: PDFParser().parser_pdf(pdf_file_path, workers=args.parse_workers), trace_memory
+    )
+    record("parse", seconds, peak, pages=len(book.pages), pages_per_second=len(book.pages) / seconds)
+
+    # 翻译
+    model = MockModel(latency=args.latency, jitter=args.jitter, seed=args.seed)
+    translator = PDFTranslator(model)
+    contents = count_contents(book)
+    _, seconds, peak = run_stage(
+        lambda: translator.translate_book(book, max_workers=args.max_workers, batch_chars=args.batch_chars),
+        trace_memory
+    )
+    record(
+        "translate", seconds, peak,
+        contents=contents,
+        requests=model.request_count,
+        contents_per_second=contents / seconds if seconds else None,
+    )
+
+    # 写入，每种格式单独计时
+    writer = Writer()
+    for file_format in args.formats:
+        output_file_path = os.path.join(output_dir, f"{name}.{file_format.lower()}")
+        try:
+            _, seconds, peak = run_stage(
+                lambda: writer.save_translated_book(book, output_file_path, file_format), trace_memory
+            )
+        except Exception as e:
+            results.append({"pdf": name, "stage": f"write_{file_format.lower()}", "error": str(e)})
+            print(f"{name:<40} {'write_' + file_format.lower():<20} 失败：{e}", flush=True)
+            continue
+        record(f"write_{file_format.lower()}", seconds, peak, output_bytes=os.path.getsize(output_file_path))
+
+    return results
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        pdf_files = args.pdf or sorted(glob.glob(os.path.join(project_root, "tests", "*.pdf")))
+
+        for pages in args.synthetic_pages:
+            synthetic_pdf = os.path.join(output_dir, f"synthetic_{pages}.pdf")
+            make_synthetic_pdf(pages, synthetic_pdf)
+            pdf_files.append(synthetic_pdf)
+
+        results = []
+        for pdf_file_path in pdf_files:
+            results.extend(benchmark_pdf(pdf_file_path, args, output_dir))
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "seed": args.seed,
+            "max_workers": args.max_workers,
+            "batch_chars": args.batch_chars,
+            "parse_workers": args.parse_workers,
+            "trace_memory": not args.no_memory,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
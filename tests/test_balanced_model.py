@@ -0,0 +1,31 @@
+import time
+
+from ai_translator.model import BalancedModel, MockModel
+
+
+def test_stream_closed_early_releases_endpoint():
+    model = BalancedModel([MockModel()])
+    stream = model.stream_request("翻译为中文，不要添加多余信息：" + "x" * 100)
+    next(stream)
+    stream.close()
+
+    stats = model.get_stats()[0]
+    assert stats["outstanding"] == 0
+    assert stats["failures"] == 0
+
+
+def test_stream_closed_early_ends_probe():
+    model = BalancedModel([MockModel()], failure_threshold=1, open_seconds=0.01)
+    endpoint = model._endpoints[0]
+    endpoint.failures = 1
+    endpoint.open_until = time.monotonic() - 1
+
+    stream = model.stream_request("翻译为中文，不要添加多余信息：" + "x" * 100)
+    next(stream)
+    assert endpoint.probing
+    stream.close()
+
+    # 调用方放弃的试探请求不会让节点一直处于试探状态
+    assert not endpoint.probing
+    assert endpoint.outstanding == 0
+    assert "".join(model.stream_request("翻译为中文，不要添加多余信息：ok")) == "ok"
@@ -0,0 +1,45 @@
+from ai_translator.book import Content, ContentType
+from ai_translator.model import MockModel
+from ai_translator.translator import PDFTranslator
+
+
+# 合并翻译时把第`2`段合并到第`1`段里，单独翻译时返回原文
+class MergingModel(MockModel):
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def make_request(self, prompt) -> (str, bool):
+        self.prompts.append(prompt)
+        if "[[1]]" in prompt:
+            return "[[1]] 一二 [[3]] 三", True
+        return super().make_request(prompt)
+
+
+def test_split_batch_translation():
+    model = MockModel()
+    assert model.split_batch_translation("[[1]] 一 [[2]] 二", 2) == {1: "一", 2: "二"}
+    # 为空的段落不在结果中，其他段落可以使用
+    assert model.split_batch_translation("[[1]] 一 [[2]] ", 2) == {1: "一"}
+
+
+def test_split_batch_translation_rejects_bad_markers():
+    model = MockModel()
+    # 缺失、重复、顺序错误、多出的编号
+    assert model.split_batch_translation("[[1]] 一二 [[3]] 三", 3) == {}
+    assert model.split_batch_translation("[[1]] 一 [[1]] 二 [[2]] 三", 2) == {}
+    assert model.split_batch_translation("[[2]] 二 [[1]] 一", 2) == {}
+    assert model.split_batch_translation("[[1]] 一 [[2]] 二 [[3]] 三", 2) == {}
+
+
+def test_merged_segments_fall_back_to_single_requests():
+    model = MergingModel()
+    translator = PDFTranslator(model)
+    batch = [(0, idx, Content(ContentType.TEXT, text)) for idx, text in enumerate(["one", "two", "three"])]
+
+    results = translator._translate_batch(batch, "中文", None)
+
+    assert results == [("one", True), ("two", True), ("three", True)]
+    # 一次合并请求，之后每一段单独请求
+    assert len(model.prompts) == 4
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+
+from aiohttp import web
+
+from ai_translator.model import GLMModel, HTTPClient
+
+
+# 在单独的线程和事件循环中运行一个模拟`ChatGLM`接口的服务
+@pytest.fixture
+def glm_url():
+    async def handle(request):
+        payload = await request.json()
+        return web.json_response({"response": payload["prompt"]})
+
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{port}/"
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def test_requests_from_other_loops_share_background_session(glm_url):
+    model = GLMModel(glm_url, timeout=10)
+
+    sessions = []
+    for text in ("first", "second"):
+        assert asyncio.run(model.async_make_request(text)) == (text, True)
+        sessions.append(HTTPClient._session)
+    assert model.make_request("third") == ("third", True)
+    sessions.append(HTTPClient._session)
+
+    # 每次`asyncio.run`都会新建事件循环，但是不会再新建`ClientSession`
+    assert sessions[0] is not None
+    assert all(session is sessions[0] for session in sessions)
+
+
+def test_get_session_outside_background_loop_is_rejected():
+    async def get_session():
+        return HTTPClient.get_session()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(get_session())
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from ai_translator.translator import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    yield queue
+    queue.close()
+
+
+def make_pdfs(root, *paths):
+    for path in paths:
+        pdf_file_path = root / path
+        pdf_file_path.parent.mkdir(parents=True, exist_ok=True)
+        pdf_file_path.write_bytes(b"%PDF-1.4")
+
+
+def get_output_file_paths(queue: JobQueue) -> [str]:
+    return [job["output_file_path"] for job in queue.list_jobs()]
+
+
+def test_directory_source_mirrors_subdirectories(tmp_path, queue):
+    make_pdfs(tmp_path / "books", "a/x.pdf", "b/x.pdf", "x.pdf")
+    output_dir = tmp_path / "out"
+
+    assert queue.add_from_source(str(tmp_path / "books"), "markdown", str(output_dir)) == 3
+    assert sorted(get_output_file_paths(queue)) == [
+        str(output_dir / "a" / "x_translated.md"),
+        str(output_dir / "b" / "x_translated.md"),
+        str(output_dir / "x_translated.md"),
+    ]
+
+
+def test_glob_source_mirrors_from_first_wildcard(tmp_path, queue):
+    make_pdfs(tmp_path / "books", "a/x.pdf", "b/x.pdf")
+    output_dir = tmp_path / "out"
+
+    queue.add_from_source(str(tmp_path / "books" / "*" / "*.pdf"), "PDF", str(output_dir))
+    assert sorted(get_output_file_paths(queue)) == [
+        str(output_dir / "a" / "x_translated.pdf"),
+        str(output_dir / "b" / "x_translated.pdf"),
+    ]
+
+
+def test_colliding_output_gets_unique_name(tmp_path, queue):
+    make_pdfs(tmp_path, "first/x.pdf", "second/x.pdf")
+    output_dir = tmp_path / "out"
+
+    queue.add_from_source(str(tmp_path / "first"), "markdown", str(output_dir))
+    queue.add_from_source(str(tmp_path / "second"), "markdown", str(output_dir))
+    output_file_paths = get_output_file_paths(queue)
+    assert output_file_paths[0] == str(output_dir / "x_translated.md")
+    assert len(set(output_file_paths)) == 2
+    assert os.path.basename(output_file_paths[1]).startswith("x_translated_")
+
+    # 再次添加时不会重复添加，也不会改变已有任务的输出文件
+    assert queue.add_from_source(str(tmp_path / "second"), "markdown", str(output_dir)) == 0
+    assert get_output_file_paths(queue) == output_file_paths
+
+
+def test_formats_with_same_extension_do_not_collide(tmp_path, queue):
+    make_pdfs(tmp_path, "x.pdf")
+
+    queue.add(str(tmp_path / "x.pdf"), "PDF")
+    queue.add(str(tmp_path / "x.pdf"), "pdf_overlay")
+    output_file_paths = get_output_file_paths(queue)
+    assert output_file_paths[0] == str(tmp_path / "x_translated.pdf")
+    assert len(set(output_file_paths)) == 2
@@ -0,0 +1,41 @@
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
+
+from ai_translator.book import ContentType
+from ai_translator.translator.pdf_parser import PDFParser
+
+
+def make_table(rows: [[str]], row_heights: [float] = None) -> Table:
+    table = Table(rows, rowHeights=row_heights)
+    table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 1, colors.black), ("VALIGN", (0, 0), (-1, -1), "TOP")]))
+    return table
+
+
+# 左边是一个较高的表格，右边是一个较矮的表格，两个表格的顶部对齐
+# 左边表格的第二行很高，文字在顶部，所以右边表格下面几行的旁边没有左边表格的文字，是单独的`line`
+def make_side_by_side_pdf(pdf_file_path: str):
+    left = make_table([["Left", "Value"], ["Tall", "cell"]], row_heights=[20, 200])
+    right = make_table([["Right", "Value"], ["R1", "10"], ["R2", "20"], ["R3", "30"], ["R4", "40"]])
+    layout = Table([[left, right]], colWidths=[250, 250])
+    layout.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
+    styles = getSampleStyleSheet()
+    document = SimpleDocTemplate(pdf_file_path, pagesize=A4)
+    document.build([Paragraph("Side by side tables", styles["Normal"]), layout,
+                    Paragraph("The end of the page.", styles["Normal"])])
+
+
+def test_side_by_side_tables_are_not_duplicated_as_text(tmp_path):
+    pdf_file_path = str(tmp_path / "tables.pdf")
+    make_side_by_side_pdf(pdf_file_path)
+
+    page = PDFParser().parser_pdf(pdf_file_path).pages[0]
+
+    tables = [content for content in page.contents if content.content_type == ContentType.TABLE]
+    texts = " ".join(content.original for content in page.contents if content.content_type == ContentType.TEXT)
+    assert len(tables) == 2
+    assert "Side by side tables" in texts
+    assert "The end of the page." in texts
+    for cell in ("Left", "Tall", "Right", "R2", "R4"):
+        assert cell not in texts
@@ -0,0 +1,27 @@
+import pytest
+
+from ai_translator.model import RateLimitException, RequestScheduler, RequestTimeoutException, TokenBucket
+
+
+def test_requests_larger_than_capacity_are_fully_charged():
+    bucket = TokenBucket(rate=100, capacity=100)
+
+    waits = [bucket.reserve(1000) for _ in range(5)]
+
+    # 5000 个令牌，桶里原有 100 个，其余按每秒 100 个补充：最后一个请求要等大约 49 秒
+    assert waits[-1] == pytest.approx(49, abs=0.5)
+    assert waits == sorted(waits)
+
+
+@pytest.mark.parametrize("error", [
+    RateLimitException("429"),
+    RequestTimeoutException("timeout"),
+])
+def test_failures_halve_the_rate(error):
+    scheduler = RequestScheduler(requests_per_minute=600, tokens_per_minute=60000, base_delay=0.01)
+
+    scheduler._on_failure(error, 0)
+
+    assert scheduler.get_rate_ratio() == 0.5
+    assert scheduler._request_bucket.rate == pytest.approx(5)
+    assert scheduler._token_bucket.rate == pytest.approx(500)
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from ai_translator.translator.skip_classifier import SkipClassifier
+
+
+@pytest.fixture
+def classifier():
+    return SkipClassifier()
+
+
+@pytest.mark.parametrize("text", [
+    "x = 2y + 1",
+    "E = mc^2",
+    "a + b ≤ c",
+    "f(x) = x^2 - 1",
+    "Δx / Δt ≈ 0.5",
+    "a/b = 2",
+])
+def test_formula_is_skipped(classifier, text):
+    assert classifier.is_untranslatable(text, "中文")
+
+
+@pytest.mark.parametrize("text", [
+    "The well-known method is fast and reliable",
+    "Chapter 1 - The Beginning",
+    "state-of-the-art results",
+    "Eighty-five is a lucky number",
+    "English-to-Chinese",
+    "text-related tools.",
+    "A / B",
+    "Q - A",
+    "Input / Output",
+])
+def test_prose_is_not_a_formula(classifier, text):
+    assert not classifier.is_untranslatable(text, "中文")
+
+
+@pytest.mark.parametrize("text", [
+    "The well-known approach works for most inputs and outputs that we tested: a note",
+    "a-" * 5000 + "!note",
+    "ab " * 5000 + "= word",
+    "x" * 20000 + " = 1",
+])
+def test_long_letter_runs_finish_quickly(classifier, text):
+    started_at = time.perf_counter()
+    assert not classifier.is_untranslatable(text, "中文")
+    assert time.perf_counter() - started_at < 1
+
+
+@pytest.mark.parametrize("text", [
+    "def translate(text):",
+    "class PDFTranslator(Base):",
+    "import os",
+    "from collections import Counter",
+    "#include <stdio.h>",
+    "if (count > 0) {",
+    "for (int i = 0; i < n; i++) {",
+    "return a == b",
+    "x = a && b;",
+    "items[0] = load(); cache = {}",
+])
+def test_code_is_skipped(classifier, text):
+    assert classifier.is_untranslatable(text, "中文")
+
+
+@pytest.mark.parametrize("text", [
+    "let him go…",
+    "return to the harbour…",
+    "let him go, the old man said",
+    "return to the harbour before dark",
+    "class of students who came to the harbour",
+    "function of the heart is to pump blood",
+    "public opinion changed slowly",
+    "private property was sold",
+    "$ 5 million was spent on the harbour",
+    "He said: use f() and g() carefully; they differ.",
+    "import duties were raised again",
+    "def leppard played that night",
+    "if (as he said) the fish was big, it was a good day",
+    "The result {see table 1}; it was large.",
+])
+def test_prose_is_not_code(classifier, text):
+    assert not classifier.is_untranslatable(text, "中文")
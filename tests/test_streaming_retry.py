@@ -0,0 +1,75 @@
+import pytest
+
+from ai_translator.model import BalancedModel, MockModel, RateLimitException, RequestScheduler, \
+    RequestTimeoutException
+
+PROMPT = "翻译为中文，不要添加多余信息：" + "streamed text " * 4
+
+
+# 前几次流式请求失败，之后和`MockModel`一样返回原文
+class FlakyStreamModel(MockModel):
+
+    def __init__(self, errors: [Exception], fail_after_chunks: int = 0):
+        super().__init__()
+        self.errors = list(errors)
+        self.fail_after_chunks = fail_after_chunks
+        self.attempts = 0
+
+    def _send_stream_request(self, prompt):
+        self.attempts += 1
+        chunks = super()._send_stream_request(prompt)
+        if self.errors:
+            for _ in range(self.fail_after_chunks):
+                yield next(chunks)
+            raise self.errors.pop(0)
+        yield from chunks
+
+
+def new_scheduler() -> RequestScheduler:
+    return RequestScheduler(max_retries=3, base_delay=0.01, max_delay=0.01)
+
+
+def test_rate_limited_stream_is_retried():
+    model = FlakyStreamModel([RateLimitException("429", retry_after=0)])
+    model.set_scheduler(new_scheduler())
+
+    translation, status = model.make_streaming_request(PROMPT)
+
+    assert status
+    assert translation == PROMPT.split("：", 1)[1].strip()
+    assert model.attempts == 2
+
+
+def test_stalled_stream_is_retried_from_the_start():
+    model = FlakyStreamModel([RequestTimeoutException("stalled")], fail_after_chunks=2)
+    model.set_scheduler(new_scheduler())
+
+    translation, status = model.make_streaming_request(PROMPT)
+
+    # 第一次请求已经收到的片段不会重复出现在结果中
+    assert translation == PROMPT.split("：", 1)[1].strip()
+    assert model.attempts == 2
+
+
+def test_stream_is_not_retried_after_chunks_reach_on_chunk():
+    model = FlakyStreamModel([RequestTimeoutException("stalled")], fail_after_chunks=1)
+    model.set_scheduler(new_scheduler())
+    chunks = []
+
+    with pytest.raises(Exception, match="流式请求中断"):
+        model.make_streaming_request(PROMPT, chunks.append)
+
+    assert len(chunks) == 1
+    assert model.attempts == 1
+
+
+def test_balanced_stream_retries_on_endpoint_scheduler():
+    endpoint = FlakyStreamModel([RateLimitException("429", retry_after=0)])
+    endpoint.set_scheduler(new_scheduler())
+    model = BalancedModel([endpoint])
+
+    translation, status = model.make_streaming_request(PROMPT)
+
+    assert translation == PROMPT.split("：", 1)[1].strip()
+    assert endpoint.attempts == 2
+    assert model.get_stats()[0]["failures"] == 0
@@ -0,0 +1,45 @@
+from ai_translator.book import TableContent
+from ai_translator.model import MockModel
+from ai_translator.translator import PDFTranslator
+from ai_translator.utils import estimate_tokens
+
+
+# 上下文很短的模型，按`JSON`的结构化请求返回原文
+class SmallContextModel(MockModel):
+    context_tokens = 120
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def make_request(self, prompt) -> (str, bool):
+        self.prompts.append(prompt)
+        return super().make_request(prompt)
+
+
+def test_large_table_is_split_by_context():
+    model = SmallContextModel()
+    translator = PDFTranslator(model)
+    rows = [[f"name of item {row}", f"description of item {row} in the store"] for row in range(20)]
+
+    translated, status = translator._translate_table(TableContent(rows), "中文")
+
+    assert status
+    assert translated.values.tolist() == rows
+    assert len(model.prompts) > 1
+    for prompt in model.prompts:
+        source = prompt.split("：", 1)[1]
+        assert estimate_tokens(source) <= model.get_max_segment_tokens() + 8
+
+
+def test_oversized_cell_is_split_into_pieces():
+    model = SmallContextModel()
+    translator = PDFTranslator(model)
+    long_cell = " ".join(f"Sentence number {idx} is here." for idx in range(30))
+    rows = [["short", long_cell]]
+
+    translated, status = translator._translate_table(TableContent(rows), "中文")
+
+    assert status
+    assert translated.values.tolist()[0][0] == "short"
+    assert len(model.prompts) > 2
@@ -0,0 +1,37 @@
+from ai_translator.book import Content, ContentType
+from ai_translator.translator.translation_journal import TranslationJournal
+
+
+def record(journal_path: str, header: dict, translation: str) -> dict:
+    journal = TranslationJournal(journal_path)
+    records = journal.load(header)
+    journal.open(header, resume=True)
+    journal.record(0, 0, Content(ContentType.TEXT, "source"), translation)
+    journal.close()
+    return records
+
+
+def test_resume_after_header_change(tmp_path):
+    journal_path = str(tmp_path / "book_translated.md.journal")
+    m1 = {"pdf": "book.pdf", "model": "M1", "target_language": "中文"}
+    m2 = {"pdf": "book.pdf", "model": "M2", "target_language": "中文"}
+
+    assert record(journal_path, m1, "M1 译文") == {}
+    # 头部不一致：不使用旧的记录，并且用新的头部重新开始
+    assert record(journal_path, m2, "M2 译文") == {}
+    # 之后使用相同的头部恢复时，可以读到上一次写入的记录
+    records = TranslationJournal(journal_path).load(m2)
+    assert records == {(0, 0): (TranslationJournal.source_digest(Content(ContentType.TEXT, "source")), "M2 译文")}
+
+
+def test_resume_with_same_header_appends(tmp_path):
+    journal_path = str(tmp_path / "book_translated.md.journal")
+    header = {"pdf": "book.pdf", "model": "M1"}
+    record(journal_path, header, "第一次")
+
+    journal = TranslationJournal(journal_path)
+    journal.open(header, resume=True)
+    journal.record(0, 1, Content(ContentType.TEXT, "next"), "第二次")
+    journal.close()
+
+    assert set(TranslationJournal(journal_path).load(header)) == {(0, 0), (0, 1)}